@@ -1,15 +1,52 @@
 import os
+import json
+import time
+import hashlib
+import threading
 from pyairtable import Api
 from dotenv import load_dotenv
 
+from rate_limiter import RateLimiter
+from supabase_utils import WriteBehindBuffer
+
 load_dotenv()
 
 AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
 AIRTABLE_TABLE_NAME = os.getenv("AIRTABLE_TABLE_NAME")
 
+# Лимит Airtable: 5 запросов в секунду на базу
+AIRTABLE_RATE_LIMIT = 5
+# performUpsert принимает до 10 записей за запрос
+AIRTABLE_BATCH_SIZE = 10
+# Отложенная запись: сколько записей копить до отправки (10 запросов performUpsert) и сколько ждать, сек
+AIRTABLE_BUFFER_ROWS = 100
+AIRTABLE_BUFFER_DELAY = 2.0
+# Поле, по которому Airtable сопоставляет записи при upsert
+AIRTABLE_KEY_FIELD = "WB ID"
+# Поля, которые пишет клиент: по ним считается хэш для пропуска записей без изменений
+AIRTABLE_FIELDS = ["Name", "Brand", "WB ID", "Price", "Status ", "Image URL"]
+
+# Локальный индекс WB ID -> record id (пустое значение - только в памяти) и его срок жизни, сек
+AIRTABLE_INDEX_CACHE = os.getenv("AIRTABLE_INDEX_CACHE", ".cache/airtable_index.json")
+AIRTABLE_INDEX_MAX_AGE = int(os.getenv("AIRTABLE_INDEX_MAX_AGE", str(24 * 3600)))
+
+# Общий лимитер на все клиенты процесса (лимит считается на базу, а не на клиента)
+airtable_limiter = RateLimiter(AIRTABLE_RATE_LIMIT, burst=1)
+
 class AirtableClient:
-    def __init__(self):
+    def __init__(self, index_path=AIRTABLE_INDEX_CACHE, index_max_age=AIRTABLE_INDEX_MAX_AGE):
+        # Индекс WB ID -> record id: строится одним постраничным обходом при первом обращении
+        self.index_path = index_path
+        self.index_max_age = index_max_age
+        self.index = None
+        self.built_at = None  # Время последнего полного обхода таблицы (срок жизни считается от него)
+        self.hashes = {}  # WB ID -> хэш последних записанных/прочитанных полей
+        self.skipped = 0
+        self._index_lock = threading.Lock()
+        self._index_dirty = False
+        self._index_failed = False  # Обход таблицы не удался: индекс неполный, на диск не пишем
+
         if not all([AIRTABLE_API_KEY, AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME]):
             print("⚠️ Airtable credentials not fully set in .env")
             self.table = None
@@ -36,35 +73,238 @@ class AirtableClient:
             print("❌ Cannot upsert to Airtable: No article provided")
             return None
 
+        return self._upsert([product_data]).get(str(article))
+
+    def upsert_products(self, products):
+        """
+        Пакетный upsert по WB ID через performUpsert: до 10 записей за запрос, не больше 5 запросов в секунду.
+        Принимает итерируемое product_data (как upsert_product), возвращает {артикул: record id}
+        """
+        if not self.table:
+            return {}
+        record_ids = self._upsert(products)
+        self.save_index()
+        return record_ids
+
+    # --- Индекс WB ID -> record id ---
+
+    def exists(self, article):
+        return self.record_id(article) is not None
+
+    def record_id(self, article):
+        return self._load_index().get(str(article))
+
+    def save_index(self):
+        """Сохраняет индекс на диск, если он менялся"""
+        if not self.index_path or not self._index_dirty or self._index_failed:
+            return
+        with self._index_lock:
+            state = {
+                "saved_at": time.time(),
+                "built_at": self.built_at,
+                "records": dict(self.index),
+                "hashes": dict(self.hashes),
+            }
+            self._index_dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"⚠️ Could not save Airtable index: {e}")
+
+    def _load_index(self):
+        if self.index is not None:
+            return self.index
+        with self._index_lock:
+            if self.index is None:
+                self.index = self._read_index_cache()
+                if self.index is None:
+                    try:
+                        self.index = self._fetch_index()
+                        self.built_at = time.time()
+                        self._index_dirty = True
+                    except Exception as e:
+                        # Запоминаем неудачу, чтобы не обходить таблицу заново на каждом вызове:
+                        # неизвестные записи уходят в performUpsert
+                        print(f"⚠️ Airtable index unavailable, using upsert for all records: {e}")
+                        self.index = {}
+                        self._index_failed = True
+        self.save_index()
+        return self.index
+
+    def _read_index_cache(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read Airtable index: {e}")
+            return None
+        # saved_at обновляется при каждой записи, поэтому возраст индекса - от полного обхода:
+        # иначе удаленные и исправленные вручную записи Airtable не заметим никогда
+        if time.time() - (state.get("built_at") or 0) > self.index_max_age:
+            return None
+        print(f"📇 Airtable index from disk: {len(state.get('records', {}))} records")
+        self.built_at = state["built_at"]
+        self.hashes = state.get("hashes", {})
+        return state.get("records", {})
+
+    def _fetch_index(self):
+        """Один постраничный обход таблицы, только записываемые поля (по 100 записей на запрос)"""
+        print("📇 Building Airtable WB ID index...")
+        index = {}
+        pages = self.table.iterate(fields=AIRTABLE_FIELDS)
+        while True:
+            airtable_limiter.acquire()
+            try:
+                page = next(pages, None)
+            finally:
+                airtable_limiter.release()
+            if page is None:
+                break
+            for record in page:
+                article = record["fields"].get(AIRTABLE_KEY_FIELD)
+                if article:
+                    index[str(article)] = record["id"]
+                    self.hashes[str(article)] = fields_hash(record["fields"])
+        print(f"📇 Airtable records in index: {len(index)}")
+        return index
+
+    def _remember(self, record_ids, hashes):
+        with self._index_lock:
+            for article, record_id in record_ids.items():
+                if self.index.get(article) != record_id or self.hashes.get(article) != hashes.get(article):
+                    self.index[article] = record_id
+                    self.hashes[article] = hashes.get(article)
+                    self._index_dirty = True
+
+    # --- Запись ---
+
+    def _upsert(self, products):
+        """
+        Известные по индексу записи обновляются batch_update по record id,
+        остальные уходят в performUpsert (на случай, если индекс устарел).
+        Записи, чьи поля не изменились с последней записи/чтения, не отправляются
+        """
+        index = self._load_index()
+
+        updates = []
+        upserts = []
+        hashes = {}
+        record_ids = {}
+        for product_data in products:
+            if not product_data.get("article"):
+                print("❌ Cannot upsert to Airtable: No article provided")
+                continue
+            fields = self._fields(product_data)
+            article = fields[AIRTABLE_KEY_FIELD]
+            record_id = index.get(article)
+            hashes[article] = fields_hash(fields)
+            if record_id and self.hashes.get(article) == hashes[article]:
+                record_ids[article] = record_id
+                self.skipped += 1
+            elif record_id:
+                updates.append({"id": record_id, "fields": fields})
+            else:
+                upserts.append(fields)
+
+        for i in range(0, len(updates), AIRTABLE_BATCH_SIZE):
+            record_ids.update(self._update_chunk(updates[i:i + AIRTABLE_BATCH_SIZE]))
+        for i in range(0, len(upserts), AIRTABLE_BATCH_SIZE):
+            record_ids.update(self._upsert_chunk(upserts[i:i + AIRTABLE_BATCH_SIZE]))
+        if self.index is not None:
+            self._remember(record_ids, hashes)
+        return record_ids
+
+    def _fields(self, product_data):
         # Подготовка полей для Airtable (согласно схеме Velveto Inventory)
-        fields = {
+        return {
             "Name": product_data.get("name"),
             "Brand": product_data.get("brand", ""),
-            "WB ID": str(article), # Используем артикул как WB ID
+            "WB ID": str(product_data["article"]), # Используем артикул как WB ID
             "Price": float(product_data.get("price", 0)),
             "Status ": product_data.get("status", "новый"), # Обратите внимание на пробел в конце имени поля
             "Image URL": product_data.get("image_url"),
         }
 
+    def _upsert_chunk(self, chunk):
+        """Один запрос performUpsert (fieldsToMergeOn = WB ID). Возвращает {артикул: record id}"""
+        airtable_limiter.acquire()
         try:
-            # Ищем существующую запись по WB ID
-            formula = f"{{WB ID}} = '{article}'"
-            existing_records = self.table.all(formula=formula)
-
-            if existing_records:
-                # Обновляем
-                record_id = existing_records[0]['id']
-                self.table.update(record_id, fields)
-                print(f"   ⬆️ Airtable: Updated {article}")
-                return record_id
-            else:
-                # Создаем новую
-                new_record = self.table.create(fields)
-                print(f"   🆕 Airtable: Created {article}")
-                return new_record['id']
+            result = self.table.batch_upsert([{"fields": fields} for fields in chunk], key_fields=[AIRTABLE_KEY_FIELD])
         except Exception as e:
-            print(f"   ⚠️ Airtable Error for {article}: {e}")
-            return None
+            print(f"   ⚠️ Airtable Error for {[fields[AIRTABLE_KEY_FIELD] for fields in chunk]}: {e}")
+            return {}
+        finally:
+            airtable_limiter.release()
+
+        # pyairtable 2.x возвращает словарь с createdRecords/records, 1.x - список записей
+        records = result["records"] if isinstance(result, dict) else result
+        created = set(result.get("createdRecords", [])) if isinstance(result, dict) else set()
+        record_ids = {}
+        for record in records:
+            article = record["fields"].get(AIRTABLE_KEY_FIELD)
+            record_ids[article] = record["id"]
+            print(f"   {'🆕 Airtable: Created' if record['id'] in created else '⬆️ Airtable: Updated'} {article}")
+        return record_ids
+
+    def _update_chunk(self, chunk):
+        """Один запрос batch_update по известным record id. Возвращает {артикул: record id}"""
+        airtable_limiter.acquire()
+        try:
+            records = self.table.batch_update(chunk)
+        except Exception as e:
+            # Например, запись удалили в Airtable и индекс устарел: повторяем через upsert по WB ID
+            print(f"   ⚠️ Airtable update failed, retrying as upsert: {e}")
+            records = None
+        finally:
+            airtable_limiter.release()
+        if records is None:
+            # Record id и хэш этих записей больше не доверяем: их заново заполнит ответ upsert
+            with self._index_lock:
+                for record in chunk:
+                    article = record["fields"][AIRTABLE_KEY_FIELD]
+                    self.index.pop(article, None)
+                    self.hashes.pop(article, None)
+                    self._index_dirty = True
+            return self._upsert_chunk([record["fields"] for record in chunk])
+
+        record_ids = {}
+        for record in records:
+            article = record["fields"].get(AIRTABLE_KEY_FIELD)
+            record_ids[article] = record["id"]
+            print(f"   ⬆️ Airtable: Updated {article}")
+        return record_ids
+
+class AirtableWriteBehind(WriteBehindBuffer):
+    """
+    Отложенная запись в Airtable по артикулу: тот же буфер, что и для Supabase (патч вроде image_url
+    сливается с последней полной записью), но пакет уходит в upsert_products - по 10 записей на запрос.
+    on_saved({артикул: record id}) вызывается из фонового потока после каждого пакета
+    """
+
+    def __init__(self, airtable, on_saved=None, max_rows=AIRTABLE_BUFFER_ROWS, max_delay=AIRTABLE_BUFFER_DELAY):
+        self.on_saved = on_saved
+        super().__init__(airtable, "airtable", on_conflict="article", max_rows=max_rows, max_delay=max_delay)
+
+    def _upsert(self, rows):
+        record_ids = self.client.upsert_products(rows)
+        if record_ids and self.on_saved:
+            self.on_saved(record_ids)
+
+def fields_hash(fields):
+    """Хэш записываемых полей. Пустые значения не учитываются (Airtable их не возвращает), числа - как float"""
+    normalized = {}
+    for name in AIRTABLE_FIELDS:
+        value = fields.get(name)
+        if value is None or value == "":
+            continue
+        normalized[name] = float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
 
 if __name__ == "__main__":
     # Тестовый запуск
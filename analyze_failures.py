@@ -2,6 +2,8 @@ import os
 from supabase import create_client
 from dotenv import load_dotenv
 
+from supabase_utils import count_by, status_stats
+
 # Load env
 load_dotenv('.env')
 url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
@@ -13,24 +15,13 @@ if not url or not key:
 
 supabase = create_client(url, key)
 
-# Query wb_search_results for failed or unknown category
-res = supabase.schema('Parser').table('wb_search_results').select("id, name, specs").execute()
-
-failed = 0
-unknown = 0
-others = 0
-
 print("🔍 Analyzing failing products...")
-for row in res.data:
-    specs = row.get('specs') or {}
-    status = specs.get('kaspi_status')
-    
-    if status == 'failed':
-        failed += 1
-    elif status == 'unknown_category':
-        unknown += 1
-    else:
-        others += 1
+# Counted server-side (GROUP BY specs->>'kaspi_status'), one round trip
+statuses = count_by(status_stats(supabase), 1)
+
+failed = statuses.get('failed', 0)
+unknown = statuses.get('unknown_category', 0)
+others = sum(statuses.values()) - failed - unknown
 
 print(f"❌ Failed: {failed}")
 print(f"❓ Unknown Category: {unknown}")
@@ -39,10 +30,10 @@ print(f"✅ Others: {others}")
 # Show top unknown categories
 if unknown > 0:
     print("\nTop Unknown Category Products:")
-    found = 0
+    res = supabase.schema('Parser').table('wb_search_results') \
+        .select("id, name") \
+        .eq("specs->>kaspi_status", "unknown_category") \
+        .limit(10) \
+        .execute()
     for row in res.data:
-        specs = row.get('specs') or {}
-        if specs.get('kaspi_status') == 'unknown_category':
-            print(f"- {row['name']} (ID: {row['id']})")
-            found += 1
-            if found >= 10: break
+        print(f"- {row['name']} (ID: {row['id']})")
@@ -0,0 +1,105 @@
+import sys
+import json
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default local Supabase DB credentials
+DB_HOST = "127.0.0.1"
+DB_PORT = "54322"
+DB_NAME = "postgres"
+DB_USER = "postgres"
+DB_PASS = "postgres"
+
+MIGRATION_FILE = "wb_search_results_indexes.sql"
+# RPC status_stats поверх новой колонки (единственное определение функции)
+RPC_FILE = "parser_status_stats.sql"
+
+# Запросы дашбордов: (название, SQL до миграции, SQL после миграции)
+QUERIES = [
+    (
+        "kaspi created today",
+        """SELECT id, name, updated_at FROM "Parser".wb_search_results
+           WHERE kaspi_created AND updated_at >= current_date ORDER BY updated_at DESC""",
+        """SELECT id, name, updated_at FROM "Parser".wb_search_results
+           WHERE kaspi_created AND updated_at >= current_date ORDER BY updated_at DESC""",
+    ),
+    (
+        "status stats",
+        """SELECT conveyor_status, specs->>'kaspi_status', COUNT(*) FROM "Parser".wb_search_results GROUP BY 1, 2""",
+        """SELECT conveyor_status, kaspi_status_spec, COUNT(*) FROM "Parser".wb_search_results GROUP BY 1, 2""",
+    ),
+    (
+        "unknown category sample",
+        """SELECT id, name FROM "Parser".wb_search_results
+           WHERE specs->>'kaspi_status' = 'unknown_category' ORDER BY id LIMIT 10""",
+        """SELECT id, name FROM "Parser".wb_search_results
+           WHERE kaspi_status_spec = 'unknown_category' ORDER BY id LIMIT 10""",
+    ),
+    (
+        "conveyor queue",
+        """SELECT id FROM "Parser".wb_search_results WHERE conveyor_status = 'idle' ORDER BY id LIMIT 100""",
+        """SELECT id FROM "Parser".wb_search_results WHERE conveyor_status = 'idle' ORDER BY id LIMIT 100""",
+    ),
+]
+
+
+def explain(cursor, sql):
+    """EXPLAIN ANALYZE: время выполнения, прочитанные блоки и корневой узел плана"""
+    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+    result = cursor.fetchone()[0]
+    plan = (json.loads(result) if isinstance(result, str) else result)[0]
+    root = plan["Plan"]
+    blocks = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    return plan["Execution Time"], blocks, describe(root)
+
+
+def describe(node):
+    """Краткое описание плана: типы узлов сверху вниз и используемые индексы"""
+    parts = [node["Node Type"] + (f" ({node['Index Name']})" if "Index Name" in node else "")]
+    for child in node.get("Plans", []):
+        parts.append(describe(child))
+    return " -> ".join(parts)
+
+
+def run(cursor, label, column):
+    print(f"\n📊 {label}")
+    results = {}
+    for name, *variants in QUERIES:
+        ms, blocks, plan = explain(cursor, variants[column])
+        results[name] = ms
+        print(f"- {name}: {ms:.2f} ms, {blocks} blocks\n    {plan}")
+    return results
+
+
+def main():
+    # --skip-apply: миграция уже применена, сравниваем только запросы по JSONB и по колонке
+    skip_apply = "--skip-apply" in sys.argv
+
+    conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    before = run(cursor, "Before migration", 0)
+
+    if not skip_apply:
+        print(f"\n🛠️  Applying {MIGRATION_FILE}...")
+        with open(MIGRATION_FILE, "r") as f:
+            cursor.execute(f.read())
+        with open(RPC_FILE, "r") as f:
+            cursor.execute(f.read())
+
+    after = run(cursor, "After migration", 1)
+
+    print("\n🏁 Summary:")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"- {name}: {before[name]:.2f} ms -> {after[name]:.2f} ms (x{speedup:.1f})")
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,21 @@
 import os
 import requests
-import base64
 from dotenv import load_dotenv
 import json
 
+from moysklad_utils import BASE_URL, MoySkladClient
+
 # Загрузка переменных окружения
 load_dotenv()
 
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
 if not LOGIN or not PASSWORD:
     print("❌ Ошибка: Не найдены логин или пароль в .env файле")
     exit(1)
 
-# Формирование заголовка авторизации
-auth_str = f"{LOGIN}:{PASSWORD}"
-auth_b64 = base64.b64encode(auth_str.encode()).decode()
-headers = {
-    "Authorization": f"Basic {auth_b64}",
-    "Content-Type": "application/json"
-}
+ms = MoySkladClient(LOGIN, PASSWORD)
 
 def get_metadata(entity):
     """Получение метаданных сущности"""
@@ -29,7 +23,7 @@ def get_metadata(entity):
     print(f"🔍 Запрос метаданных для {entity}...")
     
     try:
-        response = requests.get(url, headers=headers)
+        response = ms.get(url)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -45,7 +39,7 @@ def get_all_countries():
     print(f"🔍 Запрос списка стран...")
     
     try:
-        response = requests.get(url, headers=headers)
+        response = ms.get(url)
         response.raise_for_status()
         data = response.json()
         return data.get('rows', [])
@@ -75,7 +69,7 @@ def main():
                 attr_url = attributes['meta']['href']
                 print(f"🔍 Дополнительный запрос атрибутов: {attr_url}")
                 try:
-                    resp = requests.get(attr_url, headers=headers)
+                    resp = ms.get(attr_url)
                     resp.raise_for_status()
                     attributes = resp.json().get('rows', [])
                 except Exception as e:
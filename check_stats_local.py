@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client
 
+from supabase_utils import count_by, status_stats
+
 # Load env
 load_dotenv("/home/wik/wb-kaspi-dashboard/moysklad-web/.env.local")
 
@@ -12,19 +14,21 @@ supabase = create_client(url, key)
 
 def check_all_statuses():
     print(f"📊 Detailed Status Stats for {url}:")
+    # One GROUP BY round trip instead of a count query per status
+    by_status = count_by(status_stats(supabase), 0)
     statuses = ['done', 'idle', 'error', 'processing']
     total_found = 0
     for s in statuses:
-        count = supabase.schema('Parser').table('wb_search_results').select('id', count='exact').eq('conveyor_status', s).execute().count
+        count = by_status.get(s, 0)
         print(f"- {s}: {count}")
         total_found += count
     
     # Check null
-    null_count = supabase.schema('Parser').table('wb_search_results').select('id', count='exact').is_('conveyor_status', 'null').execute().count
+    null_count = by_status.get(None, 0)
     print(f"- None (null): {null_count}")
     total_found += null_count
     
-    total = supabase.schema('Parser').table('wb_search_results').select('id', count='exact').execute().count
+    total = sum(by_status.values())
     print(f"Total: {total}")
     print(f"Sum of parts: {total_found}")
 
@@ -2,6 +2,8 @@ import os
 from supabase import create_client
 from dotenv import load_dotenv
 
+from supabase_utils import count_by, status_stats
+
 # Load env
 load_dotenv('.env')
 url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
@@ -13,15 +15,9 @@ if not url or not key:
 
 supabase = create_client(url, key)
 
-res = supabase.schema('Parser').table('wb_search_results').select("specs").execute()
-
-statuses = {}
-
-for row in res.data:
-    specs = row.get('specs') or {}
-    status = specs.get('kaspi_status', 'none')
-    statuses[status] = statuses.get(status, 0) + 1
+# Counted server-side (GROUP BY specs->>'kaspi_status'), one round trip
+statuses = count_by(status_stats(supabase), 1)
 
 print("Kaspi Status Distribution:")
 for status, count in statuses.items():
-    print(f"- {status}: {count}")
+    print(f"- {status or 'none'}: {count}")
@@ -1,35 +1,33 @@
 import os
-import requests
-import base64
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+from ms_reference_cache import ReferenceCache
+
 load_dotenv()
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
-auth_str = f"{LOGIN}:{PASSWORD}"
-auth_b64 = base64.b64encode(auth_str.encode()).decode()
-HEADERS = {
-    "Authorization": f"Basic {auth_b64}",
-    "Content-Type": "application/json"
-}
+ms = MoySkladClient(LOGIN, PASSWORD)
 
 def create_supplier(name):
     # Check if exists
     url = f"{BASE_URL}/entity/counterparty?filter=name={name}"
-    resp = requests.get(url, headers=HEADERS)
+    resp = ms.get(url)
     if resp.status_code == 200:
         rows = resp.json().get('rows', [])
         if rows:
             print(f"✅ Supplier '{name}' already exists")
+            ReferenceCache(ms).invalidate("counterparty", name)
             return rows[0]
 
     # Create
     data = {"name": name}
-    resp = requests.post(f"{BASE_URL}/entity/counterparty", json=data, headers=HEADERS)
+    resp = ms.post(f"{BASE_URL}/entity/counterparty", json=data)
     if resp.status_code == 200:
         print(f"✅ Created supplier '{name}'")
+        # Сбрасываем закэшированный промах, чтобы импорт сразу увидел поставщика
+        ReferenceCache(ms).invalidate("counterparty", name)
         return resp.json()
     else:
         print(f"❌ Failed to create supplier: {resp.text}")
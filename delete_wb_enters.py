@@ -1,31 +1,24 @@
 import os
-import base64
-import requests
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+from ms_reference_cache import ReferenceCache
+
 # Load settings
 load_dotenv()
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
-# Authorization
-auth_str = f"{LOGIN}:{PASSWORD}"
-auth_b64 = base64.b64encode(auth_str.encode()).decode()
-HEADERS = {
-    "Authorization": f"Basic {auth_b64}",
-    "Content-Type": "application/json"
-}
+ms = MoySkladClient(LOGIN, PASSWORD)
+
+references = ReferenceCache(ms)
 
 def get_warehouse_id(name):
-    """Find warehouse ID by name"""
-    url = f"{BASE_URL}/entity/store?filter=name={name}"
+    """Find warehouse ID by name (cached reference data)"""
     try:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get('rows'):
-            return data['rows'][0]['id']
+        store = references.store(name)
+        if store:
+            return store['id']
     except Exception as e:
         print(f"❌ Error searching for warehouse '{name}': {e}")
     return None
@@ -40,7 +33,7 @@ def get_enters_by_warehouse(warehouse_id):
     documents = []
     try:
         while url:
-            resp = requests.get(url, headers=HEADERS)
+            resp = ms.get(url)
             resp.raise_for_status()
             data = resp.json()
             documents.extend(data.get('rows', []))
@@ -60,7 +53,7 @@ def delete_enters_bulk(enters_batch):
         # Prepare body: list of objects with just meta
         body = [{"meta": enter["meta"]} for enter in enters_batch]
         
-        resp = requests.post(url, json=body, headers=HEADERS)
+        resp = ms.post(url, json=body)
         resp.raise_for_status()
         print(f"✅ Deleted batch of {len(enters_batch)} documents")
         return True
@@ -84,7 +77,7 @@ def count_enters(warehouse_id):
     store_href = f"{BASE_URL}/entity/store/{warehouse_id}"
     url = f"{BASE_URL}/entity/enter?filter=store={store_href}&limit=1"
     try:
-        resp = requests.get(url, headers=HEADERS)
+        resp = ms.get(url)
         resp.raise_for_status()
         data = resp.json()
         return data.get('meta', {}).get('size', 0)
@@ -112,7 +105,7 @@ def main():
         url = f"{BASE_URL}/entity/enter?filter=store={store_href}&limit=100"
         
         try:
-            resp = requests.get(url, headers=HEADERS)
+            resp = ms.get(url)
             resp.raise_for_status()
             data = resp.json()
             enters = data.get('rows', [])
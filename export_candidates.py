@@ -3,10 +3,11 @@ import sys
 import json
 import time
 from typing import List, Dict, Any
-import requests
-from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+from ms_reference_cache import ReferenceCache
+
 # Try different .env locations
 env_paths = [
     ".env.local",
@@ -23,29 +24,25 @@ def fetch_ms_candidates(store_name="Склад ВБ"):
     """Fetches products with positive stock from MS."""
     login = os.getenv("MOYSKLAD_LOGIN")
     password = os.getenv("MOYSKLAD_PASSWORD")
-    base_url = "https://api.moysklad.ru/api/remap/1.2"
-    auth = HTTPBasicAuth(login, password)
     
     if not login or not password:
         print("Missing MS credentials")
         return []
 
-    # Get Store ID
+    ms = MoySkladClient(login, password)
+
+    # Get Store ID (cached reference data)
     print(f"Fetching Store ID for '{store_name}'...")
-    store_id = None
-    resp = requests.get(f"{base_url}/entity/store", auth=auth)
-    if resp.ok:
-        for store in resp.json().get('rows', []):
-            if store['name'] == store_name:
-                store_id = store['id']
-                break
+    references = ReferenceCache(ms)
+    store = references.store(store_name)
+    store_id = store['id'] if store else None
     
     if not store_id:
         print(f"Store '{store_name}' not found.")
         return []
 
     print(f"Fetching stock report for store {store_id}...")
-    url = f"{base_url}/report/stock/all"
+    url = f"{BASE_URL}/report/stock/all"
     params = {
         "filter": "stockMode=positiveOnly",
         "store.id": store_id,
@@ -53,7 +50,7 @@ def fetch_ms_candidates(store_name="Склад ВБ"):
     }
     
     try:
-        response = requests.get(url, auth=auth, params=params)
+        response = ms.get(url, params=params)
         response.raise_for_status()
         data = response.json()
         
@@ -1,24 +1,25 @@
 import os
-import requests
+import asyncio
 import json
 import time
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+from moysklad_async import AsyncMoySkladClient
+from ms_reference_cache import ReferenceCache
+
 env_path = os.path.join(os.getcwd(), ".env")
 load_dotenv(env_path)
 
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
-auth = (LOGIN, PASSWORD)
+ms = MoySkladClient(LOGIN, PASSWORD)
+
+references = ReferenceCache(ms)
 
 def get_store_id(name="Склад ВБ"):
-    resp = requests.get(f"{BASE_URL}/entity/store", auth=auth)
-    if resp.ok:
-        for store in resp.json().get('rows', []):
-            if store['name'] == name:
-                return store['id']
-    return None
+    store = references.store(name)
+    return store['id'] if store else None
 
 def fetch_positive_stock_products(store_name="Склад ВБ"):
     store_id = get_store_id(store_name)
@@ -32,7 +33,7 @@ def fetch_positive_stock_products(store_name="Склад ВБ"):
     url = f"{BASE_URL}/report/stock/all?filter=stockMode=positiveOnly&store.id={store_id}&limit=1000"
     
     try:
-        resp = requests.get(url, auth=auth, timeout=60)
+        resp = ms.get(url, timeout=60)
         if resp.ok:
             rows = resp.json().get('rows', [])
             print(f"✅ Found {len(rows)} candidates.")
@@ -46,11 +47,19 @@ def fetch_positive_stock_products(store_name="Склад ВБ"):
 def get_product_details(product_href):
     """Fetch full product details including images and description."""
     # Expand images to get URLs
-    resp = requests.get(f"{product_href}?expand=images", auth=auth)
+    resp = ms.get(f"{product_href}?expand=images")
     if resp.ok:
         return resp.json()
     return None
 
+async def fetch_product_details_async(product_hrefs):
+    """Fetch details for many products concurrently on one thread (async transport)."""
+    async with AsyncMoySkladClient(LOGIN, PASSWORD) as client:
+        return await client.gather_json(product_hrefs, params={"expand": "images"})
+
+def get_products_details(product_hrefs):
+    return asyncio.run(fetch_product_details_async(product_hrefs))
+
 def sync_to_kaspi():
     from temp_tlnv_parser.velveto_app.automation.kaspi.create_from_wb import create_card
     # We will need to adapt create_card or use its logic
@@ -61,8 +70,9 @@ if __name__ == "__main__":
     candidates = fetch_positive_stock_products()
     if candidates:
         # Show first 5 with details
-        for i, item in enumerate(candidates[:5]):
-            details = get_product_details(item['meta']['href'])
+        sample = candidates[:5]
+        details_list = get_products_details([item['meta']['href'] for item in sample])
+        for i, (item, details) in enumerate(zip(sample, details_list)):
             if details:
                 images = details.get('images', {}).get('rows', [])
                 img_count = len(images)
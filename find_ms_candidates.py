@@ -1,26 +1,24 @@
 import os
-import requests
 import json
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+from ms_reference_cache import ReferenceCache
+
 # Load env from the root directory
 env_path = os.path.join(os.getcwd(), ".env")
 load_dotenv(env_path)
 
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
-auth = (LOGIN, PASSWORD)
+ms = MoySkladClient(LOGIN, PASSWORD)
+
+references = ReferenceCache(ms)
 
 def get_store_id(name):
-    url = f"{BASE_URL}/entity/store"
-    resp = requests.get(url, auth=auth)
-    if resp.ok:
-        for store in resp.json().get('rows', []):
-            if store['name'] == name:
-                return store['id']
-    return None
+    store = references.store(name)
+    return store['id'] if store else None
 
 def find_candidates():
     store_name = "Склад ВБ"
@@ -33,7 +31,7 @@ def find_candidates():
     
     # Get stock report for the specific store
     stock_url = f"{BASE_URL}/report/stock/all?filter=stockMode=positiveOnly&store.id={store_id}&limit=1000"
-    resp = requests.get(stock_url, auth=auth)
+    resp = ms.get(stock_url)
     
     if not resp.ok:
         print(f"❌ Error fetching stock: {resp.status_code} {resp.text}")
@@ -1,20 +1,20 @@
 import os
-import requests
 import json
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+
 env_path = os.path.join(os.getcwd(), "temp_tlnv_parser", "velveto-app", ".env.local")
 load_dotenv(env_path)
 
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
-auth = (LOGIN, PASSWORD)
+ms = MoySkladClient(LOGIN, PASSWORD)
 
 def find_folder():
     print("🔍 Searching for 'Parser WB' folder...")
-    resp = requests.get(f"{BASE_URL}/entity/productfolder", auth=auth)
+    resp = ms.get(f"{BASE_URL}/entity/productfolder")
     if not resp.ok:
         print(f"Error: {resp.status_code} {resp.text}")
         return
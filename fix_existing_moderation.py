@@ -2,40 +2,59 @@ import os
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from supabase_utils import iter_table
+
+# Сколько id передаем в одном .in_() (ограничение длины URL PostgREST)
+UPDATE_CHUNK = 200
+
 def fix_moderation_status():
     load_dotenv()
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
     supabase = create_client(url, key)
 
-    print("🔍 Fetching products with kaspi_created=True and empty kaspi_status...")
-    
-    # Fetch records where kaspi_created is True but kaspi_status is either 'pending' or NULL
-    res = supabase.schema('Parser').table('wb_search_results') \
-        .select("id, specs") \
-        .eq("kaspi_created", True) \
-        .execute()
+    print("🔍 Fixing kaspi_status for products with kaspi_created=True...")
+
+    # One set-based UPDATE in Postgres (parser_fix_moderation.sql)
+    try:
+        count = supabase.schema('Parser').rpc("fix_moderation_status", {}).execute().data
+    except Exception as e:
+        print(f"⚠️  RPC fix_moderation_status unavailable ({e}), falling back to chunked updates")
+        count = fix_moderation_status_chunked(supabase)
 
-    if not res.data:
+    if not count:
         print("✅ No products found needing a fix.")
         return
 
-    count = 0
-    for item in res.data:
-        article_id = item['id']
-        specs = item.get('specs', {})
-        
+    print(f"🎉 Successfully fixed {count} records.")
+
+def fix_moderation_status_chunked(supabase):
+    """Группирует id по итоговому статусу и обновляет их пачками через .in_()"""
+    # Stream records where kaspi_created is True (keyset pagination, no row cap)
+    rows = iter_table(
+        supabase, 'wb_search_results', "id, specs, kaspi_status", schema='Parser',
+        filters=lambda q: q.eq("kaspi_created", True),
+    )
+
+    by_status = {}
+    for item in rows:
+        specs = item.get('specs') or {}
         # Determine status from specs if present, otherwise default to 'moderation'
-        status = specs.get('kaspi_status', 'moderation')
-        
-        print(f"🔄 Updating ID {article_id} to status '{status}'")
-        supabase.schema('Parser').table('wb_search_results') \
-            .update({"kaspi_status": status}) \
-            .eq("id", article_id) \
-            .execute()
-        count += 1
+        status = specs.get('kaspi_status') or 'moderation'
+        if item.get('kaspi_status') != status:
+            by_status.setdefault(status, []).append(item['id'])
 
-    print(f"🎉 Successfully fixed {count} records.")
+    count = 0
+    for status, ids in by_status.items():
+        print(f"🔄 Updating {len(ids)} records to status '{status}'")
+        for i in range(0, len(ids), UPDATE_CHUNK):
+            chunk = ids[i:i + UPDATE_CHUNK]
+            supabase.schema('Parser').table('wb_search_results') \
+                .update({"kaspi_status": status}) \
+                .in_("id", chunk) \
+                .execute()
+            count += len(chunk)
+    return count
 
 if __name__ == "__main__":
     fix_moderation_status()
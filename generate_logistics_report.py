@@ -4,6 +4,8 @@ import re
 from supabase import create_client
 from dotenv import load_dotenv
 
+from supabase_utils import iter_table
+
 # --- CONFIGURATION ---
 LOGISTICS_TARIFF_KZT_KG = 1500
 EXCHANGE_RATE_RUB_KZT = 5.2
@@ -74,56 +76,56 @@ def calculate_ozon_delivery(price, volume_l):
 
 def calculate_logistics():
     print("Fetching data from Supabase (Parser.wb_search_results)...")
-    try:
-        # Fetching data from Parser schema
-        res = supabase.schema('Parser').table('wb_search_results').select('id, name, price_kzt, specs, product_url').execute()
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        return
-
-    data = res.data
-    print(f"Processing {len(data)} products...")
+    # Streaming keyset-paginated read of the Parser schema: every row, one page in memory at a time
+    data = iter_table(supabase, 'wb_search_results', 'id, name, price_kzt, specs, product_url', schema='Parser')
 
     report_rows = []
     
-    for item in data:
-        name = item.get('name', 'Unknown')
-        wb_price_kzt = item.get('price_kzt', 0)
-        specs = item.get('specs', {})
-        url = item.get('product_url', '')
-
-        # 1. Extraction
-        weight = get_weight_kg(specs)
-        # Using weight (kg) as volume (L) for Ozon formula
-        volume_l = weight 
+    # Rows are fetched lazily page by page, so fetch errors surface inside the loop
+    try:
+        for item in data:
+            name = item.get('name', 'Unknown')
+            wb_price_kzt = item.get('price_kzt', 0)
+            specs = item.get('specs', {})
+            url = item.get('product_url', '')
+
+            # 1. Extraction
+            weight = get_weight_kg(specs)
+            # Using weight (kg) as volume (L) for Ozon formula
+            volume_l = weight 
         
-        # 2. Logic (Approximate, as we don't have final selling price on Kaspi/Ozon here)
-        estimated_selling_price_kzt = wb_price_kzt * 1.5
+            # 2. Logic (Approximate, as we don't have final selling price on Kaspi/Ozon here)
+            estimated_selling_price_kzt = wb_price_kzt * 1.5
         
-        # Calculations using NEW Ozon Formula
-        logistics_cost = calculate_ozon_delivery(estimated_selling_price_kzt, volume_l)
+            # Calculations using NEW Ozon Formula
+            logistics_cost = calculate_ozon_delivery(estimated_selling_price_kzt, volume_l)
         
-        net_buy_price = wb_price_kzt
-        Total_Cost = net_buy_price + logistics_cost
+            net_buy_price = wb_price_kzt
+            Total_Cost = net_buy_price + logistics_cost
         
-        commission_amount = estimated_selling_price_kzt * (KASPI_COMMISSION_PERCENT / 100)
-        tax_amount = estimated_selling_price_kzt * (TAX_PERCENT / 100)
+            commission_amount = estimated_selling_price_kzt * (KASPI_COMMISSION_PERCENT / 100)
+            tax_amount = estimated_selling_price_kzt * (TAX_PERCENT / 100)
         
-        profit = estimated_selling_price_kzt - Total_Cost - commission_amount - tax_amount
-        margin = (profit / estimated_selling_price_kzt * 100) if estimated_selling_price_kzt > 0 else 0
-
-        report_rows.append({
-            'ID WB': item.get('id'),
-            'Название': name,
-            'Цена на WB (₸)': round(wb_price_kzt),
-            'Вес (кг/л)': round(weight, 3),
-            'Логистика Ozon (₸)': round(logistics_cost),
-            'Итого себестоимость (₸)': round(Total_Cost),
-            'Оцен. цена продажи (₸)': round(estimated_selling_price_kzt),
-            'Чистая прибыль (₸)': round(profit),
-            'Маржа (%)': round(margin, 1),
-            'URL': url
-        })
+            profit = estimated_selling_price_kzt - Total_Cost - commission_amount - tax_amount
+            margin = (profit / estimated_selling_price_kzt * 100) if estimated_selling_price_kzt > 0 else 0
+
+            report_rows.append({
+                'ID WB': item.get('id'),
+                'Название': name,
+                'Цена на WB (₸)': round(wb_price_kzt),
+                'Вес (кг/л)': round(weight, 3),
+                'Логистика Ozon (₸)': round(logistics_cost),
+                'Итого себестоимость (₸)': round(Total_Cost),
+                'Оцен. цена продажи (₸)': round(estimated_selling_price_kzt),
+                'Чистая прибыль (₸)': round(profit),
+                'Маржа (%)': round(margin, 1),
+                'URL': url
+            })
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return
+
+    print(f"Fetched {len(report_rows)} products")
 
     # Create DataFrame
     df = pd.DataFrame(report_rows)
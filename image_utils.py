@@ -0,0 +1,484 @@
+import io
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None  # Без Pillow картинки отправляются как есть
+
+IMAGES_DIR = os.getenv("IMAGES_DIR", "../images")
+# Поддерживаемые расширения в порядке приоритета (если у артикула несколько файлов)
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+IMAGE_BUCKET = "product-images"
+# Подготовка перед загрузкой: максимальная сторона, качество и формат сжатия
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "1") == "1"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1600"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG или WEBP
+# Дополнительные варианты для Storage: имя -> (максимальная сторона, формат).
+# Миниатюра всегда, WebP-копии - если основной формат не WebP (IMAGE_WEBP_VARIANTS=0 - без них)
+IMAGE_THUMBNAIL_DIMENSION = int(os.getenv("IMAGE_THUMBNAIL_DIMENSION", "320"))
+IMAGE_WEBP_VARIANTS = os.getenv("IMAGE_WEBP_VARIANTS", "1") == "1"
+IMAGE_VARIANTS = {"thumb": (IMAGE_THUMBNAIL_DIMENSION, IMAGE_FORMAT)}
+if IMAGE_WEBP_VARIANTS and IMAGE_FORMAT != "WEBP":
+    IMAGE_VARIANTS["webp"] = (IMAGE_MAX_DIMENSION, "WEBP")
+    IMAGE_VARIANTS["thumb-webp"] = (IMAGE_THUMBNAIL_DIMENSION, "WEBP")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", ".cache/images")
+# Кусок чтения файла при потоковом хэшировании
+IMAGE_HASH_CHUNK = 1024 * 1024
+# Фоновая загрузка: число потоков, попыток и параметры экспоненциальной паузы между ними
+IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", "4"))
+IMAGE_UPLOAD_RETRIES = 4
+IMAGE_UPLOAD_BACKOFF_BASE = 1.0
+IMAGE_UPLOAD_BACKOFF_MAX = 30.0
+# Какие хэши уже лежат в Storage и их публичные ссылки
+IMAGE_MANIFEST_PATH = os.getenv("IMAGE_MANIFEST", ".cache/image_manifest.json")
+
+# Сигнатуры форматов: (смещение, байты, MIME, расширение)
+IMAGE_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (8, b"WEBP", "image/webp", ".webp"),
+    (0, b"GIF8", "image/gif", ".gif"),
+]
+
+
+def sniff_mime(data, default=("application/octet-stream", "")):
+    """Настоящий тип картинки по первым байтам (расширение файла поставщика бывает неверным)"""
+    for offset, signature, mime, ext in IMAGE_SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return mime, ext
+    return default
+
+
+class ImagePreparer:
+    """
+    Подготовка фото поставщика перед загрузкой: уменьшение до IMAGE_MAX_DIMENSION по большей стороне,
+    пересжатие (JPEG/WebP), удаление EXIF и прочих метаданных. Кроме основной картинки (МойСклад и Storage)
+    готовит варианты для Storage из IMAGE_VARIANTS: миниатюры и WebP-копии.
+    Результат кэшируется на диске по sha256 исходника и настройкам, повторный запуск не пересжимает.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_QUALITY,
+                 fmt=IMAGE_FORMAT, variants=IMAGE_VARIANTS):
+        self.cache_dir = cache_dir
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.fmt = fmt
+        self.variants = dict(variants) if Image is not None else {}
+        # Метка настроек и набора вариантов: часть ключа файла в манифесте Storage,
+        # при ее смене файл готовится и загружается заново
+        self.tag = "+".join([f"{max_dimension}-{fmt.lower()}{quality}", *sorted(self.variants)]) if Image is not None else ""
+
+    def prepare(self, data, sha256, variant=None):
+        """
+        Подготовленные байты картинки (исходные, если Pillow нет или картинку не удалось открыть)
+        или ее варианта из self.variants (None, если вариант не получился)
+        """
+        if Image is None:
+            return data
+        dimension, fmt = self._settings(variant)
+        cache_path = self.cache_path(sha256, variant)
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+        try:
+            prepared = self._convert(data, dimension, fmt)
+            # Уже маленький и хорошо сжатый исходник не пересжимаем, но метаданные все равно убираем
+            if not variant and len(prepared) >= len(data) and self._fits(data):
+                prepared = self._strip(data) or prepared
+        except Exception as e:
+            if variant:
+                print(f"   ⚠️  Не удалось подготовить вариант {variant}: {e}")
+                return None
+            print(f"   ⚠️  Не удалось подготовить картинку, отправляем исходник: {e}")
+            return data
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(prepared)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"   ⚠️  Не удалось сохранить подготовленную картинку: {e}")
+        return prepared
+
+    def prepare_variants(self, data, sha256):
+        """Готовит все варианты в кэш на диске (байты в памяти не держатся). Возвращает {имя: путь}"""
+        paths = {}
+        for name in self.variants:
+            self.prepare(data, sha256, name)
+            path = self.cache_path(sha256, name)
+            if os.path.exists(path):
+                paths[name] = path
+        return paths
+
+    def cache_path(self, sha256, variant=None):
+        dimension, fmt = self._settings(variant)
+        ext = ".webp" if fmt == "WEBP" else ".jpg"
+        return os.path.join(self.cache_dir, f"{sha256}-{variant or 'full'}-{dimension}-{fmt.lower()}{self.quality}{ext}")
+
+    def _settings(self, variant):
+        return self.variants[variant] if variant else (self.max_dimension, self.fmt)
+
+    def _convert(self, data, dimension, fmt):
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)  # Поворот по EXIF до удаления метаданных
+            image.thumbnail((dimension, dimension), Image.LANCZOS)  # Только уменьшение
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            if fmt == "JPEG" and has_alpha:
+                # В JPEG нет прозрачности: вырезанный товар кладем на белый фон по альфа-каналу,
+                # простой convert("RGB") сделал бы фон черным
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif fmt == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            out = io.BytesIO()
+            # Без exif=/icc_profile= Pillow не переносит метаданные исходника
+            image.save(out, format=fmt, quality=self.quality, optimize=True)
+            return out.getvalue()
+
+    def _strip(self, data):
+        """
+        Те же пиксели в исходном формате без EXIF/ICC: JPEG - с исходными таблицами квантования
+        (quality="keep"), PNG/WebP - без потерь. None, если картинку нужно повернуть по EXIF
+        (тогда годится только пересжатый вариант)
+        """
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ("JPEG", "PNG", "WEBP") or image.getexif().get(0x0112, 1) != 1:
+                return None
+            options = {"JPEG": {"quality": "keep"}, "WEBP": {"lossless": True}}.get(image.format, {})
+            out = io.BytesIO()
+            image.save(out, format=image.format, optimize=True, **options)
+            return out.getvalue()
+
+    def _fits(self, data):
+        with Image.open(io.BytesIO(data)) as image:
+            return max(image.size) <= self.max_dimension
+
+
+class ImageCatalog:
+    """
+    Каталог картинок товаров: папка сканируется один раз за запуск в словарь артикул -> файл
+    (путь, размер, mtime). Каждый потребитель содержимого регистрируется retain() и отпускает его
+    release(): прочитанные байты держатся, пока не закончит последний, так что отправка в МойСклад
+    и загрузка в Storage используют одно чтение и один хэш.
+    """
+
+    def __init__(self, images_dir=IMAGES_DIR, extensions=IMAGE_EXTENSIONS, preparer=None):
+        self.images_dir = images_dir
+        self.extensions = extensions
+        self.preparer = preparer  # ImagePreparer: read() отдает уже подготовленные байты
+        self.entries = None  # артикул -> {"path", "name", "size", "mtime", "sha256"}
+        self._data = {}      # имя файла -> содержимое, пока есть потребители
+        self._users = {}     # имя файла -> число потребителей (retain без release)
+        self._lock = threading.Lock()
+
+    def scan(self):
+        """Один проход по папке (os.scandir) вместо проверки каждого расширения на каждой строке"""
+        entries = {}
+        if os.path.isdir(self.images_dir):
+            priority = {ext: i for i, ext in enumerate(self.extensions)}
+            for item in os.scandir(self.images_dir):
+                article, ext = os.path.splitext(item.name)
+                if ext not in priority or not item.is_file():
+                    continue
+                current = entries.get(article)
+                if current and priority[current["ext"]] <= priority[ext]:
+                    continue
+                stat = item.stat()
+                entries[article] = {
+                    "path": item.path,
+                    "name": item.name,
+                    "ext": ext,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "variant": self.preparer.tag if self.preparer else "",
+                    "sha256": None,
+                }
+        print(f"🖼️  Картинок в каталоге {self.images_dir}: {len(entries)}")
+        return entries
+
+    def get(self, article):
+        """Описание файла картинки артикула или None"""
+        if self.entries is None:
+            with self._lock:
+                if self.entries is None:
+                    self.entries = self.scan()
+        return self.entries.get(str(article))
+
+    def read(self, article):
+        """
+        Содержимое картинки (читается с диска один раз, с подготовкой, если задан preparer)
+        и заполняет sha256 отдаваемых байт в описании. Варианты для Storage готовятся из того же
+        чтения, в описании остаются пути к ним: entry["variants"] = {имя: путь}
+        """
+        entry = self.get(article)
+        if not entry:
+            return None
+        with self._lock:
+            data = self._data.get(entry["name"])
+        if data is None:
+            with open(entry["path"], "rb") as f:
+                data = f.read()
+            if self.preparer:
+                entry["source_sha256"] = hashlib.sha256(data).hexdigest()
+                entry["variants"] = self.preparer.prepare_variants(data, entry["source_sha256"])
+                data = self.preparer.prepare(data, entry["source_sha256"])
+            entry["sha256"] = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                # Без зарегистрированных потребителей байты не кэшируются (некому их отпустить)
+                if self._users.get(entry["name"]):
+                    self._data[entry["name"]] = data
+        return data
+
+    def file_path(self, article):
+        """
+        Путь к файлу с теми же байтами, что отдает read(), для потоковой отправки:
+        подготовленная копия из кэша ImagePreparer или исходный файл
+        """
+        entry = self.get(article)
+        if not entry:
+            return None
+        if not self.preparer or Image is None:
+            return entry["path"]
+        if not entry.get("source_sha256"):
+            # Хэш исходника потоком: байты в памяти не остаются
+            entry["source_sha256"] = file_sha256(entry["path"])
+        prepared_path = self.preparer.cache_path(entry["source_sha256"])
+        if not os.path.exists(prepared_path):
+            self.read(article)  # Подготовка сохраняет результат в кэш на диске
+        return prepared_path if os.path.exists(prepared_path) else entry["path"]
+
+    def retain(self, article):
+        """Регистрирует потребителя содержимого (до парного release())"""
+        entry = self.get(article)
+        if entry:
+            with self._lock:
+                self._users[entry["name"]] = self._users.get(entry["name"], 0) + 1
+
+    def release(self, article):
+        """Отпускает содержимое; байты освобождаются, когда закончил последний потребитель"""
+        entry = self.get(article)
+        if entry:
+            with self._lock:
+                users = self._users.get(entry["name"], 0) - 1
+                if users > 0:
+                    self._users[entry["name"]] = users
+                else:
+                    self._users.pop(entry["name"], None)
+                    self._data.pop(entry["name"], None)
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(IMAGE_HASH_CHUNK), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ImageStore:
+    """
+    Загрузка картинок в Supabase Storage по содержимому: объект называется sha256 файла,
+    поэтому одинаковые байты загружаются один раз (даже у разных артикулов).
+    Локальный манифест хэш -> публичная ссылка позволяет не обращаться к Storage вовсе,
+    а при его отсутствии уже лежащий объект распознается по ошибке дубликата.
+    """
+
+    def __init__(self, client, bucket=IMAGE_BUCKET, manifest_path=IMAGE_MANIFEST_PATH):
+        self.client = client
+        self.bucket = bucket
+        self.manifest_path = manifest_path
+        self.manifest = {}  # sha256 -> {"url", "path", "mime", "size", "variants": {имя: sha256 варианта}}
+        self.files = {}     # "имя:размер:mtime" локального файла -> sha256 (без повторного чтения)
+        self.uploaded = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def cached_url(self, entry):
+        """Ссылка для файла из ImageCatalog, если он не менялся с прошлой загрузки (файл не читается)"""
+        with self._lock:
+            sha256 = self.files.get(file_key(entry))
+            cached = self.manifest.get(sha256) if sha256 else None
+        if cached:
+            self.skipped += 1
+            return cached["url"]
+        return None
+
+    def upload(self, data, sha256=None, entry=None):
+        """
+        Загружает байты картинки (если их еще нет в Storage) и варианты из entry["variants"],
+        записывая их в манифест при основной картинке. Возвращает публичную ссылку основной
+        """
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        with self._lock:
+            cached = self.manifest.get(sha256)
+        url = cached["url"] if cached else self._upload(data, sha256)
+        if cached:
+            self.skipped += 1
+
+        variants = {}
+        for name, path in (entry or {}).get("variants", {}).items():
+            with open(path, "rb") as f:
+                variant_data = f.read()
+            variant_sha256 = hashlib.sha256(variant_data).hexdigest()
+            with self._lock:
+                known = variant_sha256 in self.manifest
+            if not known:
+                self._upload(variant_data, variant_sha256)
+            variants[name] = variant_sha256
+        with self._lock:
+            if variants:
+                self.manifest[sha256].setdefault("variants", {}).update(variants)
+            # Файл запоминается последним: cached_url не должен отдать ссылку раньше вариантов
+            if entry:
+                self.files[file_key(entry)] = sha256
+        return url
+
+    def variant_urls(self, entry):
+        """Ссылки на варианты (миниатюры, WebP) загруженного файла из ImageCatalog: {имя: ссылка}"""
+        with self._lock:
+            sha256 = self.files.get(file_key(entry))
+            cached = self.manifest.get(sha256) if sha256 else None
+            if not cached:
+                return {}
+            return {
+                name: self.manifest[variant_sha256]["url"]
+                for name, variant_sha256 in cached.get("variants", {}).items()
+                if variant_sha256 in self.manifest
+            }
+
+    def _upload(self, data, sha256):
+        """Один объект в Storage по хэшу содержимого, запись в манифест. Возвращает публичную ссылку"""
+        mime, ext = sniff_mime(data)
+        path = f"{sha256[:2]}/{sha256}{ext}"
+        storage = self.client.storage.from_(self.bucket)
+        try:
+            storage.upload(path=path, file=data, file_options={"content-type": mime, "upsert": "false"})
+            self.uploaded += 1
+        except Exception as e:
+            # Объект с этим хэшем уже загружен прошлым запуском - содержимое то же самое
+            if "duplicate" not in str(e).lower() and "exists" not in str(e).lower():
+                raise
+            self.skipped += 1
+
+        url = storage.get_public_url(path)
+        with self._lock:
+            self.manifest[sha256] = {"url": url, "path": path, "mime": mime, "size": len(data)}
+        return url
+
+    def save(self):
+        if not self.manifest_path:
+            return
+        with self._lock:
+            state = {
+                "saved_at": time.time(),
+                "bucket": self.bucket,
+                "images": dict(self.manifest),
+                "files": dict(self.files),
+            }
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            print(f"⚠️  Не удалось сохранить манифест картинок: {e}")
+
+    def _load(self):
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Не удалось прочитать манифест картинок: {e}")
+            return
+        if state.get("bucket") == self.bucket:
+            self.manifest = state.get("images", {})
+            self.files = state.get("files", {})
+
+
+def file_key(entry):
+    return f"{entry['name']}:{entry['size']}:{entry['mtime']}:{entry.get('variant', '')}"
+
+
+class UploadQueue:
+    """
+    Фоновая очередь загрузок с пулом из workers потоков и повторами с экспоненциальной паузой.
+    submit() не ждет загрузку: результат передается в on_done из потока очереди,
+    окончательно неудачные задачи собираются в failed: ключ -> текст ошибки.
+    """
+
+    def __init__(self, workers=IMAGE_UPLOAD_WORKERS, retries=IMAGE_UPLOAD_RETRIES):
+        self.retries = retries
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-upload")
+        self.futures = []
+        self.failed = {}
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def submit(self, key, upload, on_done=None, retries=None, cleanup=None):
+        """
+        upload() - функция без аргументов, возвращающая результат (например, ссылку).
+        retries=1 - без повторов очереди (если повторы уже делает сам клиент или запрос неидемпотентен).
+        cleanup() вызывается один раз после последней попытки, удачной или нет
+        """
+        future = self.executor.submit(self._run, key, upload, on_done, retries or self.retries, cleanup)
+        with self._lock:
+            self.futures.append(future)
+        return future
+
+    def close(self):
+        """Дождаться всех загрузок и остановить потоки. Возвращает словарь ошибок"""
+        while True:
+            with self._lock:
+                pending = [f for f in self.futures if not f.done()]
+            if not pending:
+                break
+            wait(pending)
+        self.executor.shutdown(wait=True)
+        return self.failed
+
+    def _run(self, key, upload, on_done, retries, cleanup):
+        try:
+            return self._attempt(key, upload, on_done, retries)
+        finally:
+            if cleanup:
+                cleanup()
+
+    def _attempt(self, key, upload, on_done, retries):
+        for attempt in range(retries):
+            try:
+                result = upload()
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    self.failed[key] = str(e)
+                    print(f"   ⚠️  Загрузка {key} не удалась после {retries} попыток: {e}")
+                    return None
+                time.sleep(min(IMAGE_UPLOAD_BACKOFF_MAX, IMAGE_UPLOAD_BACKOFF_BASE * (2 ** attempt)) + random.uniform(0, 1))
+
+        with self._lock:
+            self.completed += 1
+        if on_done and result:
+            try:
+                on_done(result)
+            except Exception as e:
+                print(f"   ⚠️  Ошибка обработки загрузки {key}: {e}")
+        return result
@@ -1,21 +1,31 @@
 import os
 import json
-import time
-import base64
-import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 from supabase import create_client, Client
-from airtable_utils import AirtableClient
+from airtable_utils import AirtableClient, AirtableWriteBehind
+from moysklad_utils import BASE_URL, MoySkladClient, ProductArticleIndex, upload_product_image
+from ms_reference_cache import ReferenceCache
+from supabase_utils import WriteBehindBuffer
+from image_utils import IMAGE_PREPROCESS, IMAGE_VARIANTS, ImageCatalog, ImagePreparer, ImageStore, UploadQueue, sniff_mime
 
 # Загрузка настроек
 load_dotenv()
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Количество параллельных воркеров импорта (лимиты МойСклад соблюдает общий лимитер клиента)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "8"))
+# Размер пакета для массового POST /entity/product (МойСклад принимает до 1000 элементов)
+IMPORT_BATCH_SIZE = min(int(os.getenv("IMPORT_BATCH_SIZE", "100")), 1000)
+# Дисковая копия индекса артикулов (пустое значение - только в памяти)
+ARTICLE_INDEX_CACHE = os.getenv("ARTICLE_INDEX_CACHE", ".cache/ms_article_index.json")
+# Отложенная запись в Supabase: размер пакета upsert и максимальная задержка, сек
+SUPABASE_FLUSH_ROWS = int(os.getenv("SUPABASE_FLUSH_ROWS", "200"))
+SUPABASE_FLUSH_DELAY = float(os.getenv("SUPABASE_FLUSH_DELAY", "2"))
 
 # Инициализация Supabase
 supabase: Client = None
@@ -26,19 +36,35 @@ if SUPABASE_URL and SUPABASE_KEY:
     except Exception as e:
         print(f"❌ Ошибка инициализации Supabase: {e}")
 
+# Каталог картинок: папка сканируется один раз, каждый файл читается один раз
+# и (если есть Pillow) уменьшается и пересжимается перед отправкой в МойСклад и Storage.
+# Миниатюры и WebP-варианты нужны только Storage
+image_catalog = ImageCatalog(
+    preparer=ImagePreparer(variants=IMAGE_VARIANTS if supabase else {}) if IMAGE_PREPROCESS else None
+)
+# Загрузка в Storage по хэшу содержимого: неизменившиеся картинки не загружаются повторно
+image_store = ImageStore(supabase) if supabase else None
+
+# Фоновая загрузка картинок (создается в main(), без нее загрузка идет в потоке товара)
+image_uploads: UploadQueue = None
+
+# Буфер записи в products (создается в main(), без него запись синхронная)
+products_writer: WriteBehindBuffer = None
+
 # Инициализация Airtable
 airtable = AirtableClient()
+# Пакетная запись в Airtable (создается в main(), без нее - запрос на каждый товар)
+airtable_writer: AirtableWriteBehind = None
 
 # ID Доп. полей (найдены через check_metadata.py)
 ATTR_PREORDER_ID = "677beb5d-7769-11f0-0a80-00cb000c69da" # Тип: long (Целое число)
 
-# Заголовки
-auth_str = f"{LOGIN}:{PASSWORD}"
-auth_b64 = base64.b64encode(auth_str.encode()).decode()
-HEADERS = {
-    "Authorization": f"Basic {auth_b64}",
-    "Content-Type": "application/json"
-}
+# Клиент МойСклад (общий rate limit на все потоки)
+ms = MoySkladClient(LOGIN, PASSWORD)
+# Справочники (страны, валюта, типы цен, поставщики) - один запрос на ключ, с дисковым кэшем
+references = ReferenceCache(ms)
+# Индекс артикул -> товар, строится в main() одним обходом каталога
+article_index = ProductArticleIndex(ms, cache_path=ARTICLE_INDEX_CACHE or None)
 
 def save_to_supabase(product_data, moysklad_id, image_url=None):
     """Сохранение товара в Supabase"""
@@ -59,6 +85,11 @@ def save_to_supabase(product_data, moysklad_id, image_url=None):
         # Если есть мета страны, попробуем получить имя (но у нас тут только мета)
         # Для простоты сохраняем пока так, или можно расширить логику
         
+        if products_writer:
+            # Запись уйдет пакетом из фонового потока, ошибки собирает буфер
+            products_writer.put(data)
+            return data
+
         res = supabase.table("products").upsert(data, on_conflict="article").execute()
         print(f"   💾 Сохранено в Supabase")
         return res.data[0] if res.data else None
@@ -66,35 +97,21 @@ def save_to_supabase(product_data, moysklad_id, image_url=None):
         print(f"   ⚠️  Ошибка сохранения в Supabase: {e}")
 
 def get_all_countries():
-    """Загрузка всех стран для маппинга"""
+    """Загрузка всех стран для маппинга (из кэша справочников)"""
     print("🌍 Загрузка справочника стран...")
-    url = f"{BASE_URL}/entity/country"
-    countries = {}
     try:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        for row in data.get('rows', []):
-            countries[row['name'].lower()] = row['meta']
-            # Также добавим поиск по коду, если нужно
-            if 'code' in row:
-                countries[str(row['code'])] = row['meta']
+        return references.countries()
     except Exception as e:
         print(f"❌ Ошибка загрузки стран: {e}")
-    return countries
+    return {}
 
 def find_counterparty(name):
-    """Поиск контрагента (поставщика) по имени"""
+    """Поиск контрагента (поставщика) по имени (из кэша справочников)"""
     if not name or pd.isna(name):
         return None
         
-    url = f"{BASE_URL}/entity/counterparty?filter=name={name}"
     try:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get('rows'):
-            return data['rows'][0]['meta']
+        return references.counterparty(str(name))
     except Exception as e:
         print(f"⚠️  Ошибка поиска поставщика '{name}': {e}")
     return None
@@ -103,7 +120,7 @@ def find_product_by_article(article):
     """Проверка существования товара по артикулу"""
     url = f"{BASE_URL}/entity/product?filter=article={article}"
     try:
-        resp = requests.get(url, headers=HEADERS)
+        resp = ms.get(url)
         resp.raise_for_status()
         data = resp.json()
         if data.get('rows'):
@@ -114,32 +131,23 @@ def find_product_by_article(article):
 
 def get_default_currency():
     """Получение валюты по умолчанию (обычно рубли)"""
-    url = f"{BASE_URL}/entity/currency"
     try:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        # Берем первую попавшуюся или ищем рубли
-        if data.get('rows'):
-            return data['rows'][0]['meta']
+        return references.default_currency()
     except Exception as e:
         print(f"❌ Ошибка загрузки валюты: {e}")
     return None
 
 def get_price_type(name="Цена продажи"):
-    """Получение типа цены по имени"""
-    url = f"{BASE_URL}/context/companysettings/pricetype"
+    """Получение типа цены по имени (из кэша справочников)"""
     try:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        for row in data:
-            if row['name'] == name:
-                return row['meta']
+        price_types = references.price_types()
+        if name in price_types:
+            return price_types[name]
         # Если не нашли по имени, вернем первый попавшийся
-        if data:
-            print(f"⚠️  Тип цены '{name}' не найден, используем '{data[0]['name']}'")
-            return data[0]['meta']
+        if price_types:
+            first_name = next(iter(price_types))
+            print(f"⚠️  Тип цены '{name}' не найден, используем '{first_name}'")
+            return price_types[first_name]
     except Exception as e:
         print(f"❌ Ошибка загрузки типов цен: {e}")
     return None
@@ -149,70 +157,59 @@ def upload_image(article):
     if not supabase:
         return None
         
-    # Ищем файл в папке images
-    images_dir = "../images"
-    if not os.path.exists(images_dir):
-        return None
-        
-    # Поддерживаемые расширения
-    extensions = ['.jpg', '.jpeg', '.png', '.webp']
-    image_path = None
-    
-    for ext in extensions:
-        path = os.path.join(images_dir, f"{article}{ext}")
-        if os.path.exists(path):
-            image_path = path
-            break
-            
-    if not image_path:
-        return None
-        
     try:
-        file_name = f"{article}{os.path.splitext(image_path)[1]}"
-        bucket_name = "product-images"
-        
-        # Читаем файл
-        with open(image_path, 'rb') as f:
-            file_content = f.read()
-            
-        # Загружаем (upsert=True чтобы перезаписывать)
-        supabase.storage.from_(bucket_name).upload(
-            path=file_name,
-            file=file_content,
-            file_options={"content-type": "image/jpeg", "upsert": "true"} # Упрощенно считаем jpeg/png
-        )
-        
-        # Получаем публичную ссылку
-        public_url = supabase.storage.from_(bucket_name).get_public_url(file_name)
-        print(f"   🖼️  Изображение загружено: {public_url}")
-        return public_url
-        
+        return store_image(article)
     except Exception as e:
         print(f"   ⚠️  Ошибка загрузки изображения: {e}")
         return None
 
-def get_image_base64(article):
-    """Чтение и кодирование изображения в Base64"""
-    images_dir = "../images"
-    if not os.path.exists(images_dir):
-        return None, None
-        
-    extensions = ['.jpg', '.jpeg', '.png', '.webp']
-    for ext in extensions:
-        path = os.path.join(images_dir, f"{article}{ext}")
-        if os.path.exists(path):
-            with open(path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8'), os.path.basename(path)
-    return None, None
-
-def create_product(row, countries_map, currency_meta, price_type_meta):
-    """Создание товара из строки Excel"""
+def store_image(article):
+    """Загрузка картинки артикула в Storage (ошибки пробрасываются для повторов очереди)"""
+    # Ищем файл в каталоге картинок
+    image = image_catalog.get(article)
+    if not image:
+        return None
+
+    # Файл не менялся с прошлой загрузки - ссылка из манифеста, без чтения и загрузки
+    public_url = image_store.cached_url(image)
+    if public_url:
+        return public_url
+
+    # Читаем файл (если его уже прочитали для МойСклад - без повторного чтения)
+    file_content = image_catalog.read(article)
+
+    # Загружаем по хэшу: те же байты второй раз не отправляются, ссылка берется из манифеста
+    public_url = image_store.upload(file_content, image["sha256"], entry=image)
+    print(f"   🖼️  Изображение: {public_url}")
+    return public_url
+
+def cached_image_url(article):
+    """Ссылка на уже загруженную картинку без обращения к Storage (None - нужна загрузка или картинки нет)"""
+    image = image_catalog.get(article)
+    if not image or not image_store:
+        return None
+    return image_store.cached_url(image)
+
+def attach_ms_image(article, product_id):
+    """Картинка для созданного товара МойСклад: отдельный запрос, base64 кодируется из файла потоком"""
+    path = image_catalog.file_path(article)
+    if not path:
+        return None
+    # После подготовки формат может смениться (например, PNG -> JPEG)
+    with open(path, "rb") as f:
+        ext = sniff_mime(f.read(16), default=(None, os.path.splitext(path)[1]))[1]
+    upload_product_image(ms, product_id, path, f"{article}{ext}")
+    print(f"   🖼️  Изображение добавлено в МойСклад: {article}")
+    return True
+
+def prepare_product(row, countries_map, currency_meta, price_type_meta):
+    """Подготовка JSON товара из строки Excel и проверка дубликата. None - строку пропускаем"""
     name = row.get('Название')
     article = str(row.get('Артикул', '')).strip()
     
     if not name or not article:
         print("❌ Пропуск: Нет названия или артикула")
-        return False
+        return None
 
     # 3. Цены (Calculate first to have data for update)
     cost_price = float(row.get('Себестоимость', 0))
@@ -298,71 +295,221 @@ def create_product(row, countries_map, currency_meta, price_type_meta):
     if attributes:
         product_data["attributes"] = attributes
 
-    # Картинка для МойСклад
-    img_b64, img_name = get_image_base64(article)
-    if img_b64:
-        product_data["images"] = [{
-            "filename": img_name,
-            "content": img_b64
-        }]
-
-    # 1. Проверка дубликата
-    existing_product = find_product_by_article(article)
-    if existing_product:
+    # 1. Проверка дубликата (локально по индексу, если он загружен)
+    if article_index.loaded:
+        existing_product = article_index.get(article)
+    else:
+        existing_product = find_product_by_article(article)
+
+    return {
+        "article": article,
+        "name": name,
+        "product_data": product_data,
+        "existing": existing_product,
+        "min_price_rub": min_price_rub,
+        "sale_price_rub": sale_price_rub,
+    }
+
+def finalize_product(job, ms_product):
+    """Загрузка картинки, сохранение в Supabase и Airtable для товара, который уже есть в МойСклад"""
+    article = job["article"]
+    product_data = job["product_data"]
+    is_new = not job["existing"]
+
+    if is_new:
+        article_index.add(ms_product)
+        print(f"✅ Создан товар: {job['name']} ({article})")
+        print(f"   💰 Цены: Розничная={job['sale_price_rub']:.2f}, Мин={job['min_price_rub']:.2f}")
+    else:
         print(f"⏭️  Товар существует: {article}")
-        # Обновляем в Supabase
-        image_url = upload_image(article)
-        product_data["status"] = existing_product.get("status", "новый") # Сохраняем текущий статус если есть
-        db_product = save_to_supabase(product_data, existing_product['id'], image_url)
-        
-        # Синхронизация с Airtable
-        if airtable.table and db_product:
-            at_id = airtable.upsert_product({
-                **product_data,
-                "moysklad_id": existing_product['id'],
-                "image_url": image_url,
-                "status": db_product.get("status", "новый"),
-                "min_price": min_price_rub,
-                "price": sale_price_rub
-            })
-            if at_id:
-                supabase.table("products").update({"airtable_id": at_id}).eq("article", article).execute()
-
-        return True
-
-    # 6. Отправка
+        product_data["status"] = ms_product.get("status", "новый") # Сохраняем текущий статус если есть
+
+    # Потребители файла картинки: МойСклад (только при создании) и Storage (ссылки нет в манифесте).
+    # Оба регистрируются заранее, чтобы общее чтение файла освободил только последний из них
+    has_image = image_catalog.get(article) is not None
+    attach_ms = is_new and has_image
+    image_url = cached_image_url(article)
+    store = image_url is None and has_image and image_store is not None
+    upload_later = store and image_uploads is not None
+    for _ in range(attach_ms + store):
+        image_catalog.retain(article)
+
+    # Картинка в МойСклад: отдельным запросом после создания товара
+    if attach_ms:
+        if image_uploads:
+            # Без повторов очереди: POST картинки неидемпотентен, безопасные повторы делает клиент МойСклад
+            image_uploads.submit(
+                f"moysklad:{article}", lambda: attach_ms_image(article, ms_product['id']), retries=1,
+                cleanup=lambda: image_catalog.release(article),
+            )
+        else:
+            try:
+                attach_ms_image(article, ms_product['id'])
+            except Exception as e:
+                print(f"   ⚠️  Ошибка загрузки изображения в МойСклад: {e}")
+            finally:
+                image_catalog.release(article)
+
+    # Загрузка изображения: ссылка из манифеста сразу, новая картинка - в фоновой очереди
+    if store and not upload_later:
+        try:
+            image_url = upload_image(article)
+        finally:
+            image_catalog.release(article)
+
+    # Сохранение в Supabase
+    db_product = save_to_supabase(product_data, ms_product['id'], image_url)
+
+    # Синхронизация с Airtable
+    airtable_data = None
+    if airtable.table and db_product:
+        airtable_data = {
+            **product_data,
+            "moysklad_id": ms_product['id'],
+            "image_url": image_url,
+            "status": "новый" if is_new else db_product.get("status", "новый"),
+            "min_price": job["min_price_rub"],
+            "price": job["sale_price_rub"]
+        }
+        sync_airtable(article, airtable_data)
+
+    # Ставим загрузку после записи в Airtable, чтобы патч ссылки не обогнал полную запись
+    if upload_later:
+        image_uploads.submit(
+            article,
+            lambda: store_image(article),
+            on_done=lambda url: on_image_uploaded(article, url, airtable_data),
+            cleanup=lambda: image_catalog.release(article),
+        )
+
+    return True
+
+def sync_airtable(article, airtable_data):
+    """Upsert в Airtable (пакетом через буфер, если он есть) и сохранение airtable_id в products"""
+    if airtable_writer:
+        airtable_writer.put(airtable_data)
+        return
+    at_id = airtable.upsert_product(airtable_data)
+    if at_id:
+        on_airtable_saved({str(article): at_id})
+
+def on_airtable_saved(record_ids):
+    """airtable_id записанных в Airtable товаров -> products"""
+    for article, at_id in record_ids.items():
+        if products_writer:
+            products_writer.put({"article": article, "airtable_id": at_id})
+        elif supabase:
+            supabase.table("products").update({"airtable_id": at_id}).eq("article", article).execute()
+
+def on_image_uploaded(article, image_url, airtable_data):
+    """Колбэк фоновой загрузки: дописывает image_url в Supabase и Airtable"""
+    if products_writer:
+        products_writer.put({"article": article, "image_url": image_url})
+    elif supabase:
+        supabase.table("products").update({"image_url": image_url}).eq("article", article).execute()
+    if airtable_data:
+        sync_airtable(article, {**airtable_data, "image_url": image_url})
+
+def post_products_batch(payloads):
+    """
+    Массовое создание/обновление товаров одним POST (до 1000 элементов).
+    Элементы с meta обновляются, без meta - создаются.
+    Возвращает список той же длины: созданный товар или None для ошибки.
+    """
     try:
-        resp = requests.post(f"{BASE_URL}/entity/product", json=product_data, headers=HEADERS)
-        resp.raise_for_status()
-        new_product = resp.json()
-        print(f"✅ Создан товар: {name} ({article})")
-        print(f"   💰 Цены: Розничная={sale_price/100:.2f}, Мин={min_price/100:.2f}")
-        
-        # 7. Загрузка изображения
-        image_url = upload_image(article)
-        
-        # 8. Сохранение в Supabase
-        db_product = save_to_supabase(product_data, new_product['id'], image_url)
-        
-        # 9. Сохранение в Airtable
-        if airtable.table and db_product:
-            at_id = airtable.upsert_product({
-                **product_data,
-                "moysklad_id": new_product['id'],
-                "image_url": image_url,
-                "status": "новый",
-                "min_price": min_price_rub,
-                "price": sale_price_rub
-            })
-            if at_id:
-                supabase.table("products").update({"airtable_id": at_id}).eq("article", article).execute()
-        
-        return True
+        resp = ms.post(f"{BASE_URL}/entity/product", json=payloads)
+        data = resp.json()
     except Exception as e:
-        print(f"❌ Ошибка создания товара {article}: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-             print(f"   Ответ сервера: {e.response.text}")
-        return False
+        print(f"❌ Ошибка пакетного создания ({len(payloads)} шт.): {e}")
+        return [None] * len(payloads)
+
+    # При частичной ошибке МойСклад возвращает массив, где на месте ошибочных элементов объект с errors
+    if not isinstance(data, list):
+        print(f"❌ Ошибка пакетного создания ({len(payloads)} шт.): {resp.status_code} {resp.text[:300]}")
+        return [None] * len(payloads)
+
+    results = []
+    for payload, item in zip(payloads, data):
+        if not isinstance(item, dict) or "errors" in item or "id" not in item:
+            errors = item.get("errors") if isinstance(item, dict) else item
+            print(f"❌ Ошибка создания товара {payload.get('article')}: {errors}")
+            results.append(None)
+        else:
+            results.append(item)
+    # Ответ короче запроса: для оставшихся элементов результата нет, считаем их ошибкой
+    for payload in payloads[len(results):]:
+        print(f"❌ Ошибка создания товара {payload.get('article')}: нет элемента в ответе МойСклад")
+        results.append(None)
+    return results
+
+def flush_batch(batch, executor):
+    """Отправка накопленных товаров и постановка пост-обработки каждой строки в пул"""
+    print(f"📦 Отправка пакета из {len(batch)} товаров...")
+    results = post_products_batch([job["product_data"] for job in batch])
+    return [
+        executor.submit(finalize_product, job, ms_product)
+        for job, ms_product in zip(batch, results)
+        if ms_product
+    ]
+
+def import_rows(df, countries_map, currency_meta, price_type_meta, workers=IMPORT_WORKERS, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Параллельный импорт строк через пул воркеров. Темп запросов задает лимитер клиента МойСклад.
+    Новые товары копятся и уходят пакетами по batch_size, пост-обработка строк идет в том же пуле.
+    """
+    print(f"⚙️  Воркеров: {workers}, размер пакета: {batch_size}")
+    success_count = 0
+    total = len(df)
+    batch = []
+    batch_articles = set()
+    finalize_futures = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        prepare_futures = [
+            executor.submit(prepare_product, row, countries_map, currency_meta, price_type_meta)
+            for _, row in df.iterrows()
+        ]
+
+        completed = 0
+        for future in as_completed(prepare_futures):
+            completed += 1
+            if completed % 50 == 0:
+                print(f"📉 Прогресс: {completed}/{total} ({completed/total*100:.1f}%)")
+
+            try:
+                job = future.result()
+            except Exception as e:
+                print(f"❌ Ошибка воркера: {e}")
+                continue
+            if not job:
+                continue
+
+            if job["existing"]:
+                finalize_futures.append(executor.submit(finalize_product, job, job["existing"]))
+                continue
+
+            # Дубликат артикула внутри файла: МойСклад не проверяет уникальность, второй раз не создаем
+            if job["article"] in batch_articles:
+                print(f"⚠️  Повтор артикула в файле, пропуск: {job['article']}")
+                continue
+            batch.append(job)
+            batch_articles.add(job["article"])
+
+            if len(batch) >= batch_size:
+                finalize_futures.extend(flush_batch(batch, executor))
+                batch = []
+
+        if batch:
+            finalize_futures.extend(flush_batch(batch, executor))
+
+        for future in as_completed(finalize_futures):
+            try:
+                if future.result():
+                    success_count += 1
+            except Exception as e:
+                print(f"❌ Ошибка пост-обработки: {e}")
+
+    return success_count
 
 def main():
     print("🚀 Запуск импорта товаров...")
@@ -379,6 +526,11 @@ def main():
     if not price_type_meta:
         print("❌ Не удалось получить тип цены!")
         return
+
+    try:
+        article_index.load()
+    except Exception as e:
+        print(f"⚠️  Индекс артикулов не построен, проверка по одному запросу на строку: {e}")
     
     # 2. Чтение файла
     input_dir = "input"
@@ -402,13 +554,41 @@ def main():
     
     print(f"📊 Найдено строк: {len(df)}")
     
-    success_count = 0
-    for index, row in df.iterrows():
-        if create_product(row, countries_map, currency_meta, price_type_meta):
-            success_count += 1
-        # Пауза чтобы не спамить API (лимиты)
-        time.sleep(0.3)
+    global products_writer, image_uploads, airtable_writer
+    if supabase:
+        products_writer = WriteBehindBuffer(
+            supabase, "products", on_conflict="article",
+            max_rows=SUPABASE_FLUSH_ROWS, max_delay=SUPABASE_FLUSH_DELAY,
+        )
+    if airtable.table:
+        airtable_writer = AirtableWriteBehind(airtable, on_saved=on_airtable_saved)
+    image_uploads = UploadQueue()
+
+    try:
+        success_count = import_rows(df, countries_map, currency_meta, price_type_meta)
+    finally:
+        # Сначала дожидаемся картинок: их колбэки пишут в буферы Airtable и Supabase,
+        # затем Airtable: его airtable_id тоже уходят в буфер Supabase
+        if image_uploads:
+            failed_images = image_uploads.close()
+            print(f"🖼️  Фоновых загрузок: {image_uploads.completed}, ошибок: {len(failed_images)}")
+        if airtable_writer:
+            airtable_writer.close()
+            print(f"📇 Отправлено в Airtable: {airtable_writer.flushed_rows} записей")
+        if products_writer:
+            failed = products_writer.close()
+            print(f"💾 Сохранено в Supabase: {products_writer.flushed_rows} записей, ошибок: {len(failed)}")
+            for article, error in failed.items():
+                print(f"   ⚠️  {article}: {error}")
         
+    article_index.save()
+    airtable.save_index()
+    if image_store:
+        image_store.save()
+        print(f"🖼️  Картинок загружено: {image_store.uploaded}, без изменений: {image_store.skipped}")
+    if airtable.skipped:
+        print(f"📇 Airtable: без изменений, запись пропущена: {airtable.skipped}")
+
     print("="*30)
     print(f"🏁 Готово! Создано товаров: {success_count}")
 
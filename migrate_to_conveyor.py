@@ -1,7 +1,8 @@
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from supabase import create_client
-import json
 
 # Load env
 load_dotenv("/home/wik/wb-kaspi-dashboard/moysklad-web/.env.local")
@@ -11,75 +12,87 @@ key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
 supabase = create_client(url, key)
 
-def migrate():
-    print(f"🔄 Starting migration from 'products' to 'wb_search_results'...")
-    
-    # 1. Get all articles from wb_search_results to avoid duplicates
-    # Use a loop to get ALL IDs if > 1000
-    existing_ids = set()
-    offset = 0
+# Кандидатов на страницу RPC (parser_conveyor_candidates.sql)
+PAGE_SIZE = 1000
+# Строк в одном upsert
+BATCH_SIZE = 100
+# Сколько upsert'ов может быть в полете, пока читается следующая страница
+MAX_IN_FLIGHT = 4
+
+def iter_candidates(page_size=PAGE_SIZE):
+    """Строки products, которых еще нет в wb_search_results: анти-join в базе, keyset по products.id"""
+    last_id = 0
     while True:
-        res = supabase.schema('Parser').table('wb_search_results').select('id').range(offset, offset + 999).execute()
-        if not res.data:
+        res = supabase.schema('Parser').rpc(
+            'conveyor_migration_candidates', {"after_id": last_id, "page_size": page_size}
+        ).execute()
+        rows = res.data or []
+        if not rows:
             break
-        for item in res.data:
-            existing_ids.add(str(item['id']))
-        offset += 1000
-    
-    print(f"Found {len(existing_ids)} existing items in wb_search_results.")
+        yield from rows
+        last_id = rows[-1]['id']
 
-    # 2. Fetch all from products
-    batch_size = 1000
-    offset = 0
-    to_migrate = []
+def to_conveyor_row(p):
+    return {
+        "id": p['wb_id'],
+        "name": p.get('name'),
+        "price_kzt": p.get('price'),
+        "image_url": p.get('image_url'),
+        "brand": p.get('brand'),
+        "ms_created": True if p.get('moysklad_id') else False,
+        "conveyor_status": "idle",
+        "specs": {
+            "from_migration": True,
+            "original_code": p.get('code')
+        }
+    }
 
-    while True:
-        res = supabase.schema('Parser').table('products').select('*').range(offset, offset + batch_size - 1).execute()
-        if not res.data:
-            break
-        
-        for p in res.data:
-            article_raw = str(p.get('article', ''))
-            # Sanitize: some might be '123.0' or other junk
-            article = article_raw.split('.')[0]
-            if not article.isdigit():
-                continue
+def upsert_batch(batch):
+    # ignore_duplicates: строки, появившиеся в wb_search_results за время миграции, не перезаписываем
+    supabase.schema('Parser').table('wb_search_results') \
+        .upsert(batch, on_conflict="id", ignore_duplicates=True) \
+        .execute()
+    return len(batch)
 
-            if article not in existing_ids:
-                ms_created = True if p.get('moysklad_id') else False
-                
-                to_migrate.append({
-                    "id": int(article),
-                    "name": p.get('name'),
-                    "price_kzt": p.get('price'),
-                    "image_url": p.get('image_url'),
-                    "brand": p.get('brand'),
-                    "ms_created": ms_created,
-                    "conveyor_status": "idle",
-                    "specs": {
-                        "from_migration": True,
-                        "original_code": p.get('code')
-                    }
-                })
-        
-        offset += batch_size
-        print(f"Scanned {offset} products from 'products' table...")
+def migrate():
+    print(f"🔄 Starting migration from 'products' to 'wb_search_results'...")
+
+    scanned = 0
+    success_count = 0
+    failed_count = 0
+    in_flight = deque()
 
-    print(f"Identified {len(to_migrate)} new products to migrate.")
+    def collect(entry):
+        nonlocal success_count, failed_count
+        size, future = entry
+        try:
+            success_count += future.result()
+            print(f"Migrated {success_count} products (scanned {scanned} candidates)")
+        except Exception as e:
+            failed_count += size
+            print(f"Error migrating batch: {e}")
+
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as executor:
+        batch = {}
+        for p in iter_candidates():
+            scanned += 1
+            # Несколько товаров с одним артикулом: в пакете остается первый
+            batch.setdefault(p['wb_id'], to_conveyor_row(p))
+            if len(batch) < BATCH_SIZE:
+                continue
+            if len(in_flight) >= MAX_IN_FLIGHT:
+                collect(in_flight.popleft())
+            rows = list(batch.values())
+            in_flight.append((len(rows), executor.submit(upsert_batch, rows)))
+            batch = {}
 
-    # 3. Insert into wb_search_results in batches
-    if to_migrate:
-        success_count = 0
-        for i in range(0, len(to_migrate), 100):
-            batch = to_migrate[i:i+100]
-            try:
-                supabase.schema('Parser').table('wb_search_results').upsert(batch).execute()
-                success_count += len(batch)
-                print(f"Migrated batch {i//100 + 1}/{(len(to_migrate)-1)//100 + 1} ({success_count}/{len(to_migrate)})")
-            except Exception as e:
-                print(f"Error migrating batch: {e}")
+        if batch:
+            rows = list(batch.values())
+            in_flight.append((len(rows), executor.submit(upsert_batch, rows)))
+        while in_flight:
+            collect(in_flight.popleft())
 
-    print(f"✅ Migration complete. Total migrated: {len(to_migrate)}")
+    print(f"✅ Migration complete. Total migrated: {success_count}, failed: {failed_count}")
 
 if __name__ == "__main__":
     migrate()
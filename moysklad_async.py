@@ -0,0 +1,140 @@
+import asyncio
+import random
+import httpx
+
+from moysklad_utils import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    IDEMPOTENT_METHODS,
+    MAX_RETRIES,
+    MS_MAX_CONCURRENCY,
+    PAGE_LIMIT,
+    RETRY_STATUSES,
+    shared_limiter,
+)
+
+# Шаг опроса лимитера, пока ждем свободный слот
+ASYNC_POLL_INTERVAL = 0.05
+
+
+class AsyncRateLimiter:
+    """
+    Асинхронный вход в синхронный RateLimiter: бюджет аккаунта, пауза по 429 и AIMD
+    общие с MoySkladClient. Ожидание не блокирует поток event loop.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def acquire(self):
+        while True:
+            with self.limiter._cond:
+                timeout = self.limiter._try_acquire()
+            if timeout == 0:
+                return
+            # Слот освобождают и потоки, которые event loop не разбудят - опрашиваем
+            await asyncio.sleep(ASYNC_POLL_INTERVAL if timeout is None else min(timeout, ASYNC_POLL_INTERVAL))
+
+    async def release(self, response=None):
+        # Заголовки ответа httpx читаются так же, как у requests (status_code, headers)
+        self.limiter.release(response)
+
+
+# Один лимитер на процесс поверх shared_limiter: асинхронные и потоковые клиенты
+# делят 45 запросов / 3 с и 5 параллельных запросов аккаунта
+shared_async_limiter = AsyncRateLimiter(shared_limiter)
+
+
+class AsyncMoySkladClient:
+    """
+    Асинхронный клиент МойСклад (httpx.AsyncClient) для массовых запросов в одном потоке.
+    Число запросов в полете ограничено семафором, темп - общим с MoySkladClient token bucket по лимитам аккаунта.
+    """
+
+    def __init__(self, login, password, max_concurrency=MS_MAX_CONCURRENCY, limiter=None, timeout=60.0):
+        self.limiter = limiter or shared_async_limiter
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            auth=(login, password),
+            headers={"Accept": "application/json;charset=utf-8", "Accept-Encoding": "gzip"},
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def request(self, method, url, retry=None, **kwargs):
+        """Те же правила повторов, что и у MoySkladClient.request"""
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(MAX_RETRIES):
+            last_attempt = attempt == MAX_RETRIES - 1
+            async with self.semaphore:
+                await self.limiter.acquire()
+                resp = None
+                try:
+                    resp = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    # Без retry повторяем только ошибки установки соединения (запрос не ушел)
+                    if last_attempt or not (retry or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))):
+                        raise
+                    await _backoff(attempt)
+                    continue
+                finally:
+                    await self.limiter.release(resp)
+
+            if last_attempt:
+                return resp
+            if resp.status_code == 429:
+                continue
+            if resp.status_code in RETRY_STATUSES and retry:
+                await _backoff(attempt)
+                continue
+            return resp
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def iter_rows(self, url, params=None, limit=PAGE_LIMIT):
+        """Асинхронный постраничный обход коллекции (offset/limit)"""
+        params = dict(params or {})
+        offset = 0
+        while True:
+            resp = await self.get(url, params={**params, "limit": limit, "offset": offset})
+            resp.raise_for_status()
+            data = resp.json()
+            rows = data.get("rows", [])
+            for row in rows:
+                yield row
+
+            offset += len(rows)
+            size = data.get("meta", {}).get("size", 0)
+            if len(rows) < limit or offset >= size:
+                break
+
+    async def gather_json(self, urls, params=None):
+        """Параллельные GET по списку ссылок. Для неудачных запросов возвращает None"""
+        async def fetch(url):
+            try:
+                resp = await self.get(url, params=params)
+                return resp.json() if resp.is_success else None
+            except httpx.HTTPError:
+                return None
+        return await asyncio.gather(*(fetch(url) for url in urls))
+
+
+async def _backoff(attempt):
+    await asyncio.sleep(min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) + random.uniform(0, 1))
@@ -0,0 +1,310 @@
+import os
+import json
+import base64
+import time
+import random
+import threading
+import requests
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from rate_limiter import RateLimiter
+
+BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
+
+# Лимиты МойСклад: 45 запросов за 3 секунды на аккаунт, до 5 параллельных запросов на пользователя
+MS_RATE_LIMIT = 45
+MS_RATE_PERIOD = 3.0
+MS_MAX_CONCURRENCY = 5
+MAX_RETRIES = 10
+PAGE_LIMIT = 1000
+# Сколько страниц коллекции запрашивать наперед при обходе
+PREFETCH_CONCURRENCY = MS_MAX_CONCURRENCY
+
+# Пул соединений сессии (keep-alive) и таймауты по умолчанию: (connect, read)
+POOL_SIZE = 20
+DEFAULT_TIMEOUT = (10, 60)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {500, 502, 503, 504}
+# Методы, которые безопасно повторять после таймаута чтения и 5xx (запрос мог уже выполниться)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Локальный индекс артикулов: сколько секунд дисковая копия считается пригодной для догрузки изменений
+ARTICLE_INDEX_MAX_AGE = 24 * 3600
+# Блок чтения картинки при потоковом base64 (кратен 3, чтобы куски base64 склеивались без паддинга)
+IMAGE_STREAM_CHUNK = 3 * 64 * 1024
+
+# Общий лимитер для всех клиентов процесса: бюджет считается на аккаунт, а не на клиент
+shared_limiter = RateLimiter(MS_RATE_LIMIT, per=MS_RATE_PERIOD, max_concurrency=MS_MAX_CONCURRENCY)
+
+
+class MoySkladClient:
+    """
+    Клиент API МойСклад: одна requests.Session с пулом keep-alive соединений, gzip,
+    таймаутами и общими правилами повторов. Безопасен для использования из нескольких потоков.
+    """
+
+    def __init__(self, login, password, limiter=None, pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.login = login
+        self.limiter = limiter or shared_limiter
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (login, password)
+        self.session.headers.update({
+            "Accept": "application/json;charset=utf-8",
+            "Accept-Encoding": "gzip",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, retry=None, **kwargs):
+        """
+        Запрос к API через общий лимитер.
+        429 - пауза по X-Lognex-Retry-After (ставит лимитер), 5xx и сетевые ошибки - экспоненциальный backoff.
+        Неидемпотентные методы (POST) повторяются только если запрос точно не выполнен: 429 и ошибка
+        установки соединения. retry=True разрешает полные повторы для безопасных POST (массовое удаление).
+        После MAX_RETRIES возвращается последний ответ или пробрасывается последняя ошибка.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(MAX_RETRIES):
+            last_attempt = attempt == MAX_RETRIES - 1
+            self.limiter.acquire()
+            resp = None
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt or not (retry or _not_sent(e)):
+                    raise
+                _backoff(attempt)
+                continue
+            finally:
+                self.limiter.release(resp)
+
+            if last_attempt:
+                return resp
+            if resp.status_code == 429:
+                continue
+            if resp.status_code in RETRY_STATUSES and retry:
+                _backoff(attempt)
+                continue
+            return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def _not_sent(error):
+    """Ошибка до отправки запроса (соединение не установлено) - повтор не может его задвоить"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _backoff(attempt):
+    time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) + random.uniform(0, 1))
+
+
+def iter_rows(client, url, params=None, limit=PAGE_LIMIT, concurrency=PREFETCH_CONCURRENCY):
+    """
+    Постраничный обход коллекции МойСклад (offset/limit), строки отдаются по одной и по порядку.
+    После первой страницы известен meta.size, поэтому следующие страницы запрашиваются
+    параллельно (до concurrency наперед), темп по-прежнему задает лимитер клиента.
+    """
+    params = dict(params or {})
+
+    def fetch(offset):
+        resp = client.get(url, params={**params, "limit": limit, "offset": offset})
+        resp.raise_for_status()
+        return resp.json()
+
+    data = fetch(0)
+    rows = data.get("rows", [])
+    yield from rows
+
+    size = data.get("meta", {}).get("size", 0)
+    if len(rows) < limit or len(rows) >= size:
+        return
+
+    offsets = iter(range(len(rows), size, limit))
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        window = deque(executor.submit(fetch, offset) for offset in islice(offsets, concurrency))
+        while window:
+            data = window.popleft().result()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                window.append(executor.submit(fetch, next_offset))
+            yield from data.get("rows", [])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ProductArticleIndex:
+    """
+    Индекс артикул -> товар МойСклад.
+    Строится одним постраничным обходом /entity/product вместо поиска по артикулу на каждую строку.
+    Дисковая копия (cache_path) позволяет при следующем запуске догрузить только изменения.
+    """
+
+    def __init__(self, client, cache_path=None, max_age=ARTICLE_INDEX_MAX_AGE):
+        self.client = client
+        self.cache_path = cache_path
+        self.max_age = max_age
+        self.products = {}
+        self.updated = None  # Максимальный updated среди загруженных товаров
+        # Время последнего полного обхода: догрузка по updated не видит удалений, поэтому
+        # через max_age после полного обхода индекс строится заново
+        self.built_at = None
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._load_cache():
+            print(f"📇 Индекс артикулов с диска: {len(self.products)}, догружаем изменения с {self.updated}")
+            self._fetch({"filter": f"updated>={self.updated}"})
+        else:
+            print("📇 Построение индекса артикулов...")
+            self.products = {}
+            self.updated = None
+            self._fetch()
+            self.built_at = time.time()
+        self.loaded = True
+        print(f"📇 Товаров в индексе: {len(self.products)}")
+        self.save()
+
+    def get(self, article):
+        return self.products.get(str(article).strip())
+
+    def add(self, product):
+        """Добавление созданного/обновленного товара, чтобы индекс оставался актуальным"""
+        with self._lock:
+            self._put(product)
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            state = {
+                "saved_at": time.time(),
+                "built_at": self.built_at,
+                "updated": self.updated,
+                "products": dict(self.products),
+            }
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"⚠️  Не удалось сохранить индекс артикулов: {e}")
+
+    def _fetch(self, params=None):
+        for row in iter_rows(self.client, f"{BASE_URL}/entity/product", params):
+            self._put(row)
+
+    def _put(self, product):
+        article = product.get("article")
+        if not article:
+            return
+        self.products[str(article).strip()] = {
+            "id": product["id"],
+            "meta": product["meta"],
+            "name": product.get("name"),
+        }
+        updated = (product.get("updated") or "")[:19]  # Формат фильтра: yyyy-MM-dd HH:mm:ss
+        if updated and (not self.updated or updated > self.updated):
+            self.updated = updated
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Не удалось прочитать индекс артикулов: {e}")
+            return False
+        # Возраст считается от полного обхода, а не от последнего сохранения
+        if time.time() - (state.get("built_at") or 0) > self.max_age or not state.get("updated"):
+            return False
+        self.products = state.get("products", {})
+        self.updated = state["updated"]
+        self.built_at = state["built_at"]
+        return True
+
+
+def iter_folder_products(client, folder_id, params=None):
+    """
+    Товары одной группы без обхода всего каталога: сервер фильтрует по pathName группы.
+    Строки дополнительно сверяются по productFolder, чтобы не захватить одноименную группу.
+    """
+    resp = client.get(f"{BASE_URL}/entity/productfolder/{folder_id}")
+    resp.raise_for_status()
+    folder = resp.json()
+    path = "/".join(part for part in (folder.get("pathName"), folder["name"]) if part)
+
+    params = {**(params or {}), "filter": f"pathName={path}"}
+    for row in iter_rows(client, f"{BASE_URL}/entity/product", params):
+        folder_href = row.get("productFolder", {}).get("meta", {}).get("href", "")
+        if folder_id in folder_href:
+            yield row
+
+
+class StreamedImageBody:
+    """
+    JSON-тело {"filename": ..., "content": <base64>} для POST /entity/product/{id}/images,
+    которое кодируется из файла блоками по мере отправки: в памяти один блок, а не файл,
+    его base64-строка и сериализованный JSON. Длина известна заранее (Content-Length),
+    тело можно пройти повторно, поэтому повторы MoySkladClient.request отправляют его заново.
+    """
+
+    def __init__(self, path, filename):
+        self.path = path
+        self.prefix = ('{"filename": ' + json.dumps(filename) + ', "content": "').encode("utf-8")
+        self.suffix = b'"}'
+        self.size = os.path.getsize(path)
+
+    def __len__(self):
+        return len(self.prefix) + 4 * ((self.size + 2) // 3) + len(self.suffix)
+
+    def __iter__(self):
+        yield self.prefix
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(IMAGE_STREAM_CHUNK)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+        yield self.suffix
+
+
+def upload_product_image(client, product_id, path, filename):
+    """Добавляет картинку к уже созданному товару, файл передается потоком"""
+    resp = client.post(
+        f"{BASE_URL}/entity/product/{product_id}/images",
+        data=StreamedImageBody(path, filename),
+        headers={"Content-Type": "application/json;charset=utf-8"},
+    )
+    resp.raise_for_status()
+    return resp
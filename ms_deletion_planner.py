@@ -0,0 +1,131 @@
+from collections import defaultdict
+
+from moysklad_utils import BASE_URL
+
+# Массовое удаление МойСклад: до 1000 объектов в одном POST /entity/<type>/delete
+BULK_DELETE_LIMIT = 1000
+# Глубина цепочки зависимостей (документ, блокирующий документ, ...)
+MAX_DEPTH = 5
+# Сколько раз повторяем удаление объекта после очистки его зависимостей
+MAX_ROUNDS = 5
+
+ERROR_IN_USE = 1028
+ERROR_NOT_FOUND = 1021
+
+
+def entity_href(href):
+    """Ссылка на сам объект: позиции документа (/positions/...) удаляются вместе с документом"""
+    head, sep, tail = href.partition("/entity/")
+    parts = tail.split("?")[0].split("/")
+    return f"{BASE_URL}/entity/{parts[0]}/{parts[1]}" if sep and len(parts) >= 2 else href
+
+
+def entity_type(href):
+    return href.partition("/entity/")[2].split("/")[0]
+
+
+class DeletionPlanner:
+    """
+    Пакетное удаление объектов МойСклад вместе с зависимостями.
+    Каждый слой удаляется массовыми /entity/<type>/delete запросами. Зависимости из ошибок 1028
+    собираются по всему слою, дедуплицируются и удаляются раньше зависящих от них объектов.
+    """
+
+    def __init__(self, client, chunk_size=BULK_DELETE_LIMIT, log=print, journal=None):
+        self.client = client
+        self.chunk_size = min(chunk_size, BULK_DELETE_LIMIT)
+        self.log = log
+        self.journal = journal  # JobJournal: результаты фиксируются после каждого пакета
+        self.deleted = journal.deleted_hrefs() if journal else set()
+        self.failed = {}  # href -> описание ошибки
+        self.targets = set()
+        self.requests = 0
+
+    def delete(self, entities):
+        """Удаление объектов (строки API с meta). Возвращает (удалено, ошибки) по переданным объектам"""
+        hrefs = [entity_href(e["meta"]["href"]) for e in entities]
+        self.targets.update(hrefs)
+        self._delete_layer(hrefs, depth=0)
+        done = [h for h in hrefs if h in self.deleted]
+        failed = {h: self.failed[h] for h in hrefs if h in self.failed}
+        self.log(f"🏁 Deleted {len(done)}/{len(hrefs)}, failed {len(failed)}, requests: {self.requests}")
+        return done, failed
+
+    def _delete_layer(self, hrefs, depth):
+        pending = [h for h in dict.fromkeys(hrefs) if h not in self.deleted]
+        for round_no in range(MAX_ROUNDS + 1):
+            if not pending:
+                return
+            blocked = self._bulk_delete(pending)
+            if not blocked:
+                return
+
+            dependencies = {dep for deps in blocked.values() for dep in deps} - self.deleted
+            if round_no == MAX_ROUNDS or depth >= MAX_DEPTH or not dependencies:
+                failed = {href: "blocked by dependencies" for href in blocked}
+                self.failed.update(failed)
+                self._record([], failed)
+                return
+
+            self.log(f"   🔗 Layer {depth + 1}: {len(dependencies)} unique dependencies block {len(blocked)} objects")
+            self._delete_layer(list(dependencies), depth + 1)
+            pending = list(blocked)
+
+    def _bulk_delete(self, hrefs):
+        """Удаляет объекты по типам и чанкам. Возвращает {href: зависимости} для заблокированных"""
+        blocked = {}
+        by_type = defaultdict(list)
+        for href in hrefs:
+            by_type[entity_type(href)].append(href)
+
+        for type_name, type_hrefs in by_type.items():
+            for i in range(0, len(type_hrefs), self.chunk_size):
+                chunk = type_hrefs[i:i + self.chunk_size]
+                results = self._post_delete(type_name, chunk)
+                for href, errors in zip(chunk, results):
+                    self._apply_result(href, errors, blocked)
+                self._record(
+                    [href for href in chunk if href in self.deleted],
+                    {href: self.failed[href] for href in chunk if href in self.failed},
+                )
+                self.log(f"   🗑️ {type_name}: {len(chunk)} processed, {len(self.deleted)} deleted in total")
+        return blocked
+
+    def _post_delete(self, type_name, chunk):
+        """Один массовый запрос. Для каждого объекта возвращает список ошибок (пустой - удален)"""
+        body = [{"meta": {"href": href, "type": type_name, "mediaType": "application/json"}} for href in chunk]
+        self.requests += 1
+        try:
+            # Повтор безопасен: уже удаленные объекты вернутся ошибкой 1021 и засчитаются как удаленные
+            resp = self.client.post(f"{BASE_URL}/entity/{type_name}/delete", json=body, retry=True)
+            data = resp.json() if resp.content else []
+        except Exception as e:
+            return [[{"error": str(e)}]] * len(chunk)
+
+        if isinstance(data, list) and len(data) == len(chunk):
+            return [item.get("errors", []) if isinstance(item, dict) else [] for item in data]
+        if resp.ok:
+            return [[]] * len(chunk)
+        errors = data.get("errors") if isinstance(data, dict) else None
+        return [errors or [{"error": f"{resp.status_code} {resp.text[:300]}"}]] * len(chunk)
+
+    def _record(self, deleted, failed):
+        if self.journal and (deleted or failed):
+            self.journal.record(deleted, failed, lambda href: "target" if href in self.targets else "dependency")
+
+    def _apply_result(self, href, errors, blocked):
+        if not errors or all(err.get("code") == ERROR_NOT_FOUND for err in errors):
+            self.deleted.add(href)
+            self.failed.pop(href, None)
+            return
+
+        dependencies = set()
+        for err in errors:
+            if err.get("code") == ERROR_IN_USE:
+                for dep in err.get("dependencies", []):
+                    if dep.get("href"):
+                        dependencies.add(entity_href(dep["href"]))
+        if dependencies:
+            blocked[href] = dependencies
+        else:
+            self.failed[href] = "; ".join(err.get("error", str(err)) for err in errors)
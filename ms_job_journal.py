@@ -0,0 +1,99 @@
+import os
+import time
+import sqlite3
+
+JOURNAL_DIR = ".cache/jobs"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    href TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,              -- target / dependency
+    name TEXT,
+    status TEXT NOT NULL,            -- pending / deleted / failed
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS objects_kind_status ON objects (kind, status);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def journal_path(job_name):
+    return os.path.join(JOURNAL_DIR, f"{job_name}.sqlite")
+
+
+class JobJournal:
+    """
+    Журнал долгой очистки (SQLite): найденные цели, удаленные объекты и зависимости, ошибки.
+    Перезапущенный job продолжает с места остановки, ошибки уходят в отдельный проход повтора.
+    """
+
+    def __init__(self, path, fresh=False):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    # --- Сканирование ---
+
+    def scan_complete(self):
+        row = self.conn.execute("SELECT value FROM state WHERE key = 'scan_complete'").fetchone()
+        return bool(row)
+
+    def add_targets(self, entities):
+        """Сохраняет найденные цели (уже известные объекты не перезаписываются)"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO objects (href, kind, name, status, updated_at) VALUES (?, 'target', ?, 'pending', ?)",
+                [(e["meta"]["href"], e.get("name"), now) for e in entities],
+            )
+
+    def mark_scan_complete(self):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('scan_complete', ?)", (str(time.time()),))
+
+    # --- Выборки для возобновления ---
+
+    def targets(self, status):
+        """Цели с заданным статусом в формате строк API (meta + name)"""
+        rows = self.conn.execute(
+            "SELECT href, name FROM objects WHERE kind = 'target' AND status = ? ORDER BY rowid", (status,)
+        ).fetchall()
+        return [{"meta": {"href": href}, "name": name} for href, name in rows]
+
+    def deleted_hrefs(self):
+        return {row[0] for row in self.conn.execute("SELECT href FROM objects WHERE status = 'deleted'")}
+
+    def summary(self):
+        return {
+            (kind, status): count
+            for kind, status, count in self.conn.execute(
+                "SELECT kind, status, COUNT(*) FROM objects GROUP BY kind, status"
+            )
+        }
+
+    # --- Запись результатов ---
+
+    def record(self, deleted, failed, kind_of):
+        """Фиксирует результат одного пакета: deleted - список href, failed - {href: ошибка}"""
+        now = time.time()
+        rows = [(href, kind_of(href), "deleted", None, now) for href in deleted]
+        rows += [(href, kind_of(href), "failed", error, now) for href, error in failed.items()]
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO objects (href, kind, status, error, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (href) DO UPDATE SET status = excluded.status, error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from moysklad_utils import BASE_URL, iter_rows
+
+REFERENCE_CACHE_PATH = os.getenv("MS_REFERENCE_CACHE", ".cache/ms_reference.json")
+REFERENCE_CACHE_TTL = int(os.getenv("MS_REFERENCE_TTL", str(24 * 3600)))
+
+
+class ReferenceCache:
+    """
+    Кэш справочников МойСклад: страны, валюты, типы цен, контрагенты, склады, группы товаров.
+    Каждый ключ запрашивается не более одного раза за запуск, значения живут ttl секунд
+    и сохраняются на диск, так что теплый старт не делает запросов к справочникам.
+    """
+
+    def __init__(self, client, path=REFERENCE_CACHE_PATH, ttl=REFERENCE_CACHE_TTL):
+        self.client = client
+        # У каждого аккаунта свой файл: скрипты с разными .env не должны получать чужие meta
+        self.path = account_path(path, getattr(client, "login", None))
+        self.ttl = ttl
+        self.entries = {}  # kind -> key -> {"value": ..., "fetched_at": ...}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._load()
+
+    # --- Справочники ---
+
+    def countries(self):
+        """Страны: имя в нижнем регистре и код -> meta"""
+        def load():
+            countries = {}
+            for row in iter_rows(self.client, f"{BASE_URL}/entity/country"):
+                countries[row['name'].lower()] = row['meta']
+                if 'code' in row:
+                    countries[str(row['code'])] = row['meta']
+            return countries
+        return self._get("country", "*", load)
+
+    def default_currency(self):
+        """Валюта по умолчанию (первая в списке)"""
+        def load():
+            resp = self.client.get(f"{BASE_URL}/entity/currency")
+            resp.raise_for_status()
+            rows = resp.json().get('rows', [])
+            return rows[0]['meta'] if rows else None
+        return self._get("currency", "default", load)
+
+    def price_types(self):
+        """Типы цен: имя -> meta, в порядке настроек компании"""
+        def load():
+            resp = self.client.get(f"{BASE_URL}/context/companysettings/pricetype")
+            resp.raise_for_status()
+            return {row['name']: row['meta'] for row in resp.json()}
+        return self._get("pricetype", "*", load)
+
+    def price_type(self, name):
+        return self.price_types().get(name)
+
+    def counterparty(self, name):
+        """
+        Контрагент по точному имени -> meta. Отсутствие кэшируется только до конца запуска:
+        после create_supplier.py следующий импорт должен найти нового поставщика
+        """
+        def load():
+            resp = self.client.get(f"{BASE_URL}/entity/counterparty", params={"filter": f"name={name}"})
+            resp.raise_for_status()
+            rows = resp.json().get('rows', [])
+            return rows[0]['meta'] if rows else None
+        return self._get("counterparty", name, load)
+
+    def stores(self):
+        """Склады: имя -> {id, meta}"""
+        return self._get("store", "*", lambda: self._load_named(f"{BASE_URL}/entity/store"))
+
+    def store(self, name):
+        return self.stores().get(name)
+
+    def product_folders(self):
+        """Группы товаров: имя -> {id, meta, pathName}"""
+        return self._get("productfolder", "*", lambda: self._load_named(f"{BASE_URL}/entity/productfolder"))
+
+    def product_folder(self, name):
+        return self.product_folders().get(name)
+
+    # --- Управление кэшем ---
+
+    def invalidate(self, kind=None, key=None):
+        """Сброс всего кэша, одного справочника или одного ключа"""
+        with self._lock:
+            if kind is None:
+                self.entries = {}
+            elif key is None:
+                self.entries.pop(kind, None)
+            else:
+                self.entries.get(kind, {}).pop(key, None)
+        self._save()
+
+    def _get(self, kind, key, loader):
+        entry = self._fresh(kind, key)
+        if entry is not None:
+            return entry["value"]
+
+        # Один запрос на ключ, даже если его одновременно ждут несколько потоков
+        with self._lock:
+            key_lock = self._key_locks.setdefault((kind, key), threading.Lock())
+        with key_lock:
+            entry = self._fresh(kind, key)
+            if entry is not None:
+                return entry["value"]
+            value = loader()
+            with self._lock:
+                self.entries.setdefault(kind, {})[key] = {"value": value, "fetched_at": time.time()}
+            self._save()
+            return value
+
+    def _fresh(self, kind, key):
+        with self._lock:
+            entry = self.entries.get(kind, {}).get(key)
+        if entry and time.time() - entry["fetched_at"] < self.ttl:
+            return entry
+        return None
+
+    def _load_named(self, url):
+        return {
+            row['name']: {"id": row['id'], "meta": row['meta'], "pathName": row.get('pathName', '')}
+            for row in iter_rows(self.client, url)
+        }
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Не удалось прочитать кэш справочников: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            # Промахи (None) на диск не пишем, иначе они переживут создание сущности
+            entries = {
+                kind: {key: entry for key, entry in keys.items() if entry["value"] is not None}
+                for kind, keys in self.entries.items()
+            }
+            data = json.dumps(entries, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  Не удалось сохранить кэш справочников: {e}")
+
+
+def account_path(path, login):
+    """.cache/ms_reference.json -> .cache/ms_reference.<хэш логина>.json"""
+    if not path or not login:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha1(login.encode('utf-8')).hexdigest()[:12]}{ext}"
@@ -0,0 +1,24 @@
+-- Кандидаты на перенос Parser.products -> Parser.wb_search_results (RPC: Parser.conveyor_migration_candidates)
+-- Анти-join считается в Postgres, строки отдаются страницами по products.id (keyset).
+CREATE OR REPLACE FUNCTION "Parser".conveyor_migration_candidates(after_id BIGINT DEFAULT 0, page_size INT DEFAULT 1000)
+RETURNS TABLE (id BIGINT, wb_id BIGINT, name TEXT, price NUMERIC, image_url TEXT, brand TEXT, moysklad_id TEXT, code TEXT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT c.id, c.wb_id, c.name, c.price, c.image_url, c.brand, c.moysklad_id, c.code
+    FROM (
+        SELECT
+            p.id::BIGINT AS id,
+            -- Артикул вида '123.0' -> 123, мусор -> NULL (CASE гарантирует порядок проверки и приведения)
+            CASE WHEN split_part(p.article::TEXT, '.', 1) ~ '^[0-9]{1,18}$'
+                 THEN split_part(p.article::TEXT, '.', 1)::BIGINT END AS wb_id,
+            p.name::TEXT, p.price::NUMERIC, p.image_url::TEXT, p.brand::TEXT, p.moysklad_id::TEXT, p.code::TEXT
+        FROM "Parser".products p
+        WHERE p.id > after_id
+    ) c
+    WHERE c.wb_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM "Parser".wb_search_results w WHERE w.id = c.wb_id)
+    ORDER BY c.id
+    LIMIT page_size;
+$$;
+
+GRANT EXECUTE ON FUNCTION "Parser".conveyor_migration_candidates(BIGINT, INT) TO service_role;
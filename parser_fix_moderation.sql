@@ -0,0 +1,16 @@
+-- Массовое исправление kaspi_status одним UPDATE (RPC: Parser.fix_moderation_status)
+CREATE OR REPLACE FUNCTION "Parser".fix_moderation_status()
+RETURNS BIGINT
+LANGUAGE sql VOLATILE
+AS $$
+    WITH updated AS (
+        UPDATE "Parser".wb_search_results
+        SET kaspi_status = COALESCE(specs->>'kaspi_status', 'moderation')
+        WHERE kaspi_created = TRUE
+          AND kaspi_status IS DISTINCT FROM COALESCE(specs->>'kaspi_status', 'moderation')
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM updated;
+$$;
+
+GRANT EXECUTE ON FUNCTION "Parser".fix_moderation_status() TO service_role;
@@ -0,0 +1,13 @@
+-- Статистика статусов конвейера и Kaspi одним запросом (RPC: Parser.status_stats)
+-- Единственное определение функции. Колонку kaspi_status_spec и индекс под GROUP BY
+-- создает wb_search_results_indexes.sql - применять после него
+CREATE OR REPLACE FUNCTION "Parser".status_stats()
+RETURNS TABLE (conveyor_status TEXT, kaspi_status TEXT, total BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT conveyor_status::TEXT, kaspi_status_spec, COUNT(*)
+    FROM "Parser".wb_search_results
+    GROUP BY 1, 2;
+$$;
+
+GRANT EXECUTE ON FUNCTION "Parser".status_stats() TO service_role;
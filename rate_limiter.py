@@ -0,0 +1,103 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket с адаптивным ограничением параллельности (AIMD).
+    Один экземпляр делится между всеми потоками, которые ходят в один API.
+    """
+
+    def __init__(self, rate, per=1.0, burst=None, max_concurrency=None):
+        self.rate = rate / per  # Токенов в секунду
+        self.capacity = burst if burst is not None else rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency) if max_concurrency else None
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Блокирует поток, пока не появится токен и свободный слот"""
+        with self._cond:
+            while True:
+                timeout = self._try_acquire()
+                if timeout == 0:
+                    return
+                self._cond.wait(timeout)
+
+    def _try_acquire(self):
+        """
+        Под self._cond: занимает токен и слот, если можно (возвращает 0),
+        иначе - сколько ждать (None - до release() другого потока)
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.concurrency is not None and self.in_flight >= int(self.concurrency):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def release(self, response=None):
+        """Освобождает слот и подстраивает лимиты по ответу сервера"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if response is not None:
+                self._observe(response.status_code, response.headers)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Останавливает выдачу токенов всем потокам на заданное время"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self._cond.notify_all()
+
+    def _observe(self, status_code, headers):
+        # Бюджет аккаунта: X-RateLimit-Limit запросов за X-Lognex-Retry-TimeInterval мс
+        limit = _header_float(headers, "X-RateLimit-Limit")
+        interval_ms = _header_float(headers, "X-Lognex-Retry-TimeInterval")
+        if limit and interval_ms:
+            self.rate = limit / (interval_ms / 1000)
+            self.capacity = limit
+
+        if status_code == 429:
+            retry_ms = _header_float(headers, "X-Lognex-Retry-After") or _header_float(headers, "X-Lognex-Reset")
+            delay = retry_ms / 1000 if retry_ms else 1.0
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.tokens = 0
+            # Мультипликативное снижение параллельности
+            if self.concurrency is not None:
+                self.concurrency = max(1.0, self.concurrency / 2)
+            return
+
+        remaining = _header_float(headers, "X-RateLimit-Remaining")
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0:
+                reset_ms = _header_float(headers, "X-Lognex-Reset")
+                if reset_ms:
+                    self.paused_until = max(self.paused_until, time.monotonic() + reset_ms / 1000)
+
+        # Аддитивное восстановление параллельности
+        if self.concurrency is not None and status_code < 400:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+
+def _header_float(headers, name):
+    value = headers.get(name) if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,142 @@
+import threading
+
+PAGE_SIZE = 1000
+
+
+def iter_table(client, table, columns="*", schema=None, page_size=PAGE_SIZE, filters=None, key="id"):
+    """
+    Потоковое чтение таблицы Supabase с keyset-пагинацией по key (id > последний id).
+    В отличие от одного .select().execute() не упирается в max-rows PostgREST и держит в памяти одну страницу.
+    filters - функция, которая добавляет условия к запросу: lambda q: q.eq("kaspi_created", True)
+    """
+    if columns != "*" and key not in [c.strip() for c in columns.split(",")]:
+        columns = f"{key}, {columns}"
+
+    last_key = None
+    while True:
+        source = client.schema(schema) if schema else client
+        query = source.table(table).select(columns)
+        if filters:
+            query = filters(query)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        rows = query.order(key).limit(page_size).execute().data or []
+        if not rows:
+            break
+        yield from rows
+        last_key = rows[-1][key]
+
+
+def status_stats(client):
+    """
+    Количество строк Parser.wb_search_results по (conveyor_status, specs->>kaspi_status).
+    Считается в Postgres (RPC из parser_status_stats.sql) за один запрос, без выгрузки specs.
+    Возвращает {(conveyor_status, kaspi_status): count}, отсутствующий статус - None.
+    """
+    rows = client.schema("Parser").rpc("status_stats", {}).execute().data or []
+    return {(row["conveyor_status"], row["kaspi_status"]): row["total"] for row in rows}
+
+
+def count_by(stats, index):
+    """Свертка status_stats по одному измерению: 0 - conveyor_status, 1 - kaspi_status"""
+    counts = {}
+    for key, total in stats.items():
+        counts[key[index]] = counts.get(key[index], 0) + total
+    return counts
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись в таблицу Supabase: строки копятся в памяти и уходят многострочным upsert
+    из фонового потока по достижении max_rows или через max_delay секунд, остаток - при close().
+    Строки с одним ключом (on_conflict) сливаются, частичная строка (патч) дописывается
+    к последней полной, чтобы upsert не нарушал NOT NULL. Ошибки копятся в failed: ключ -> текст.
+    """
+
+    def __init__(self, client, table, on_conflict, schema=None, max_rows=500, max_delay=2.0):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.schema = schema
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.pending = {}   # ключ -> строка, ожидающая записи
+        self.written = {}   # ключ -> последняя отправленная строка (основа для патчей)
+        self.failed = {}
+        self.flushed_rows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{table}", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        """Поставить строку (или патч с ключом on_conflict) в очередь записи, не дожидаясь Supabase"""
+        key = row[self.on_conflict]
+        with self._cond:
+            base = self.pending.get(key) or self.written.get(key) or {}
+            self.pending[key] = {**base, **row}
+            if len(self.pending) >= self.max_rows:
+                self._cond.notify()
+
+    def close(self):
+        """Записать остаток и остановить фоновый поток. Возвращает словарь ошибок"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        return self.failed
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self.pending) < self.max_rows:
+                    self._cond.wait(self.max_delay)
+                rows, self.pending = self.pending, {}
+                # Основа для патчей - с момента отправки, а не после ответа: иначе патч,
+                # пришедший во время upsert, уйдет без колонок NOT NULL
+                self.written.update(rows)
+                closed = self._closed
+            if rows:
+                self._flush(rows)
+            if closed:
+                with self._cond:
+                    if not self.pending:
+                        return
+
+    def _flush(self, rows):
+        # Многострочный upsert заполняет отсутствующие колонки NULL, поэтому пакеты собираются
+        # из строк с одинаковым набором колонок
+        groups = {}
+        for key, row in rows.items():
+            groups.setdefault(tuple(sorted(row)), []).append((key, row))
+        for items in groups.values():
+            self._flush_items(items)
+
+    def _flush_items(self, items):
+        for i in range(0, len(items), self.max_rows):
+            chunk = items[i:i + self.max_rows]
+            try:
+                self._upsert([row for _, row in chunk])
+            except Exception as e:
+                # Пакет отклонен целиком: повторяем по одной строке, чтобы найти виноватые
+                print(f"⚠️  Supabase: пакет {self.table} ({len(chunk)} шт.) не записан, повтор по строкам: {e}")
+                for key, row in chunk:
+                    try:
+                        self._upsert([row])
+                    except Exception as row_error:
+                        self.failed[key] = str(row_error)
+                        print(f"   ⚠️  Supabase: строка {key} не записана: {row_error}")
+                        continue
+                    self._written(key)
+                continue
+            for key, _ in chunk:
+                self._written(key)
+
+    def _upsert(self, rows):
+        source = self.client.schema(self.schema) if self.schema else self.client
+        source.table(self.table).upsert(rows, on_conflict=self.on_conflict).execute()
+
+    def _written(self, key):
+        with self._cond:
+            self.failed.pop(key, None)
+            self.flushed_rows += 1
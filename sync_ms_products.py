@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+from dotenv import load_dotenv
+
+from supabase import create_client
+from moysklad_utils import BASE_URL, MoySkladClient, iter_rows
+
+# Загрузка настроек
+load_dotenv()
+LOGIN = os.getenv("MOYSKLAD_LOGIN")
+PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Отметка последней синхронизации (максимальный updated / moment из МойСклад)
+SYNC_STATE_PATH = os.getenv("MS_SYNC_STATE", ".cache/ms_products_sync.json")
+# Строк в одном upsert в Supabase
+UPSERT_BATCH_SIZE = 500
+# Аудит МойСклад отдает не больше 100 контекстов / событий на страницу
+AUDIT_PAGE_LIMIT = 100
+# Статус товара, удаленного в МойСклад (строка в Supabase остается для истории)
+DELETED_STATUS = "удален"
+
+ms = MoySkladClient(LOGIN, PASSWORD)
+
+
+def load_state(path=SYNC_STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Не удалось прочитать состояние синхронизации: {e}")
+        return {}
+
+
+def save_state(state, path=SYNC_STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def to_supabase_row(product):
+    """Строка таблицы products из товара МойСклад (те же поля, что пишет import_products)"""
+    sale_prices = product.get("salePrices") or [{}]
+    return {
+        "moysklad_id": product["id"],
+        "name": product["name"],
+        "article": str(product["article"]).strip(),
+        "price": sale_prices[0].get("value", 0) / 100,
+        "country": product.get("country", {}).get("meta", {}).get("href", "").split("/")[-1],
+    }
+
+
+def sync_changed(supabase, since=None):
+    """
+    Догружает товары, измененные с отметки since (весь каталог, если отметки нет),
+    и upsert'ит их в products пачками. Возвращает (число товаров, новая отметка)
+    """
+    params = {"filter": f"updated>={since}"} if since else None
+    high_water = since
+    batch = {}  # article -> строка: дубль артикула в одном upsert PostgreSQL отвергает
+    count = 0
+
+    def flush():
+        nonlocal count
+        if batch:
+            supabase.table("products").upsert(list(batch.values()), on_conflict="article").execute()
+            count += len(batch)
+            print(f"   💾 Upserted {count} changed products")
+            batch.clear()
+
+    for product in iter_rows(ms, f"{BASE_URL}/entity/product", params):
+        updated = (product.get("updated") or "")[:19]  # Формат фильтра: yyyy-MM-dd HH:mm:ss
+        if updated and (not high_water or updated > high_water):
+            high_water = updated
+        if not product.get("article"):
+            continue
+        row = to_supabase_row(product)
+        batch[row["article"]] = row
+        if len(batch) >= UPSERT_BATCH_SIZE:
+            flush()
+    flush()
+    return count, high_water
+
+
+def sync_deleted(supabase, since):
+    """
+    Удаления из аудита МойСклад с отметки since: контексты GET /audit
+    (entityType=product, eventType=delete), их события - /audit/{id}/events.
+    Строки products с удаленными moysklad_id помечаются статусом DELETED_STATUS.
+    Возвращает (число удаленных, новая отметка)
+    """
+    params = {"filter": f"entityType=product;eventType=delete;moment>={since}"}
+    high_water = since
+    deleted_ids = set()
+    for context in iter_rows(ms, f"{BASE_URL}/audit", params, limit=AUDIT_PAGE_LIMIT):
+        moment = (context.get("moment") or "")[:19]
+        if moment > high_water:
+            high_water = moment
+        events_url = context.get("events", {}).get("meta", {}).get("href") or f"{BASE_URL}/audit/{context['id']}/events"
+        for event in iter_rows(ms, events_url, limit=AUDIT_PAGE_LIMIT):
+            # В одном контексте могут быть события и по другим сущностям
+            if event.get("entityType") != "product" or event.get("eventType") != "delete":
+                continue
+            href = event.get("entity", {}).get("meta", {}).get("href", "")
+            if href:
+                deleted_ids.add(href.rstrip("/").split("/")[-1])
+    deleted_ids = list(deleted_ids)
+
+    for i in range(0, len(deleted_ids), UPSERT_BATCH_SIZE // 2):
+        chunk = deleted_ids[i:i + UPSERT_BATCH_SIZE // 2]
+        supabase.table("products").update({"status": DELETED_STATUS}).in_("moysklad_id", chunk).execute()
+    return len(deleted_ids), high_water
+
+
+def main():
+    # --full: сбросить отметку и пройти весь каталог заново
+    full = "--full" in sys.argv
+
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ Не заданы SUPABASE_URL / SUPABASE_KEY")
+        return
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    state = {} if full else load_state()
+    start = time.time()
+    since = state.get("updated")
+    print(f"🔄 Синхронизация товаров МойСклад -> Supabase {'с ' + since if since else '(полная)'}")
+
+    changed, state["updated"] = sync_changed(supabase, since)
+    print(f"✅ Изменено товаров: {changed}")
+
+    # Удаления имеют смысл только относительно предыдущей отметки
+    deleted_since = state.get("deleted") or since
+    if deleted_since:
+        try:
+            deleted, state["deleted"] = sync_deleted(supabase, deleted_since)
+            print(f"🗑️  Удалено в МойСклад: {deleted}")
+        except Exception as e:
+            print(f"⚠️  Не удалось прочитать ленту аудита (удаления не синхронизированы): {e}")
+            state["deleted"] = deleted_since  # Повторим с той же отметки в следующий раз
+    else:
+        state["deleted"] = state["updated"]
+
+    if state.get("updated"):
+        save_state(state)
+    print(f"🏁 Готово за {time.time() - start:.1f} с, отметка: {state.get('updated')}")
+
+
+if __name__ == "__main__":
+    main()
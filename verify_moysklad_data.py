@@ -1,23 +1,17 @@
 import os
-import requests
-import base64
 from dotenv import load_dotenv
 
+from moysklad_utils import BASE_URL, MoySkladClient
+
 load_dotenv()
 LOGIN = os.getenv("MOYSKLAD_LOGIN")
 PASSWORD = os.getenv("MOYSKLAD_PASSWORD")
-BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
 
-auth_str = f"{LOGIN}:{PASSWORD}"
-auth_b64 = base64.b64encode(auth_str.encode()).decode()
-HEADERS = {
-    "Authorization": f"Basic {auth_b64}",
-    "Content-Type": "application/json"
-}
+ms = MoySkladClient(LOGIN, PASSWORD)
 
 def verify_product(article):
     url = f"{BASE_URL}/entity/product?filter=article={article}&expand=supplier,images"
-    resp = requests.get(url, headers=HEADERS)
+    resp = ms.get(url)
     if resp.status_code != 200:
         print(f"❌ Failed to get product: {resp.status_code}")
         return
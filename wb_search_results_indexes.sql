@@ -0,0 +1,28 @@
+-- Миграция Parser.wb_search_results: статус Kaspi отдельной колонкой и индексы для дашбордов.
+-- ADD COLUMN ... STORED переписывает таблицу один раз; повторный запуск ничего не меняет.
+
+-- specs->>'kaspi_status' как обычная колонка (колонка kaspi_status уже занята статусом модерации)
+ALTER TABLE "Parser".wb_search_results
+    ADD COLUMN IF NOT EXISTS kaspi_status_spec TEXT GENERATED ALWAYS AS (specs->>'kaspi_status') STORED;
+
+-- Статистика конвейера и Kaspi: GROUP BY conveyor_status, kaspi_status_spec (index-only scan)
+CREATE INDEX IF NOT EXISTS wb_search_results_conveyor_kaspi_idx
+    ON "Parser".wb_search_results (conveyor_status, kaspi_status_spec);
+
+-- Очередь конвейера: WHERE conveyor_status = ... ORDER BY id
+CREATE INDEX IF NOT EXISTS wb_search_results_conveyor_id_idx
+    ON "Parser".wb_search_results (conveyor_status, id);
+
+-- Созданные в Kaspi за период: WHERE kaspi_created AND updated_at >= ... ORDER BY updated_at DESC
+CREATE INDEX IF NOT EXISTS wb_search_results_kaspi_created_updated_idx
+    ON "Parser".wb_search_results (updated_at DESC)
+    WHERE kaspi_created;
+
+-- Проблемные карточки Kaspi: WHERE kaspi_status_spec IN ('failed', 'unknown_category')
+CREATE INDEX IF NOT EXISTS wb_search_results_kaspi_problems_idx
+    ON "Parser".wb_search_results (kaspi_status_spec, id)
+    WHERE kaspi_status_spec IN ('failed', 'unknown_category');
+
+-- status_stats читает kaspi_status_spec: после миграции примените parser_status_stats.sql
+
+ANALYZE "Parser".wb_search_results;